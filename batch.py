@@ -0,0 +1,161 @@
+"""
+Headless batch mode: generate quotes for a directory of screenshots.
+
+Runs the same analysis and quote pipeline as the tray app, without Qt or
+a desktop session, over a bounded worker pool, and writes one JSONL line
+per image with the quote and its timings:
+
+    python batch.py screenshots/ --vault ~/Notes --workers 4 --output results.jsonl
+    python batch.py screenshots/ --vault ~/Notes --ollama-url http://gpu-box:11434/api/generate --repeat 5
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List
+
+from source.config import Config
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
+
+logger = logging.getLogger("batch")
+
+
+def find_images(directory: Path) -> List[Path]:
+    """Images directly in or below directory, in a stable order."""
+    return sorted(path for path in directory.rglob("*") if path.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def configure(args) -> None:
+    """Apply command-line overrides before any provider is constructed."""
+    Config.PIPELINE_MODE = args.mode
+    Config.WATCH_VAULT = False
+    Config.OLLAMA_PRELOAD_ON_START = False
+    Config.QUOTE_CACHE_ENABLED = args.caches
+    Config.SCREEN_CACHE_ENABLED = args.caches
+    # One pooled connection per worker, so concurrent calls don't reconnect
+    Config.OLLAMA_POOL_SIZE = max(Config.OLLAMA_POOL_SIZE, args.workers)
+    if args.ollama_url:
+        Config.OLLAMA_URL = args.ollama_url
+    if args.text_model:
+        Config.OLLAMA_TEXT_MODEL = args.text_model
+    if args.vision_model:
+        Config.OLLAMA_VISION_MODEL = args.vision_model
+    if args.metrics:
+        Config.METRICS_JSONL_PATH = str(args.metrics)
+
+
+def run_batch(args) -> int:
+    from PIL import Image
+    from source.assistant_core import AIAssistant
+    from source.vault_shards import ShardedContextManager
+
+    images = find_images(args.images) * args.repeat
+    if args.limit:
+        images = images[:args.limit]
+    if not images:
+        logger.error(f"No images found in {args.images}")
+        return 1
+
+    context_manager = ShardedContextManager(vault_paths=args.vault, store_path=args.store)
+    assistant = AIAssistant(
+        use_local_ai=args.provider == "ollama",
+        context_manager=context_manager
+    )
+    assistant.context_ready.wait()
+    logger.info(f"Indexed {context_manager.note_count()} notes from {len(args.vault)} vaults")
+    if args.provider == "ollama":
+        assistant.warm_up(background=False)
+
+    def process(index: int, path: Path) -> dict:
+        start_time = time.perf_counter()
+        try:
+            with Image.open(path) as image:
+                image.load()
+            prepared = assistant.prepare_notification(image=image)
+        except Exception as e:
+            return {"index": index, "image": str(path), "outcome": "failed", "error": str(e)}
+        record = {
+            "index": index,
+            "image": str(path),
+            "quote": prepared.message,
+            "wall_s": round(time.perf_counter() - start_time, 3),
+            "worker": threading.current_thread().name,
+        }
+        record.update(assistant.metrics.last_run() or {})
+        return record
+
+    def results() -> Iterator[dict]:
+        # Submit lazily with a bounded window so only a few decoded images are alive at once
+        window = args.workers * 2
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="batch") as pool:
+            for index, path in enumerate(images):
+                pending.append(pool.submit(process, index, path))
+                while len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    latencies, failures = [], 0
+    batch_start = time.perf_counter()
+    with open(args.output, "w", encoding="utf-8") as out:
+        for record in results():
+            record.update(provider=args.provider, text_model=Config.OLLAMA_TEXT_MODEL, vision_model=Config.OLLAMA_VISION_MODEL)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            if record.get("outcome") in ("ok", "cached"):
+                latencies.append(record["latency_s"])
+            else:
+                failures += 1
+    elapsed = time.perf_counter() - batch_start
+    assistant.shutdown()
+
+    summary = f"{len(images)} images in {elapsed:.1f}s ({len(images) / elapsed:.2f}/s) with {args.workers} workers"
+    if latencies:
+        summary += (
+            f", latency p50 {percentile(latencies, 0.5):.2f}s p90 {percentile(latencies, 0.9):.2f}s "
+            f"p99 {percentile(latencies, 0.99):.2f}s"
+        )
+    print(f"{summary}, {failures} not ok. Results in {args.output}")
+    return 0 if not failures else 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate quotes for a directory of screenshots")
+    parser.add_argument("images", type=Path, help="directory of screenshots")
+    parser.add_argument("--vault", type=Path, nargs="+", required=True, help="Obsidian vault folders")
+    parser.add_argument("--store", type=Path, default=Path("batch_context_store.sqlite3"),
+                        help="base name of the context stores (kept apart from the app's)")
+    parser.add_argument("--provider", choices=["ollama", "gemini"], default="ollama")
+    parser.add_argument("--mode", choices=["two_stage", "fused"], default=Config.PIPELINE_MODE)
+    parser.add_argument("--workers", type=int, default=4, help="concurrent pipelines")
+    parser.add_argument("--repeat", type=int, default=1, help="run every image this many times")
+    parser.add_argument("--limit", type=int, help="stop after this many images")
+    parser.add_argument("--ollama-url", help="e.g. http://host:11434/api/generate")
+    parser.add_argument("--text-model")
+    parser.add_argument("--vision-model")
+    parser.add_argument("--caches", action="store_true", help="keep the quote and screen caches on")
+    parser.add_argument("--output", type=Path, default=Path("batch_results.jsonl"))
+    parser.add_argument("--metrics", type=Path, help="also append pipeline metrics JSONL here")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    configure(args)
+    sys.exit(run_batch(args))
+
+
+if __name__ == "__main__":
+    main()
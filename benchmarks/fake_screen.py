@@ -0,0 +1,82 @@
+"""
+Deterministic fake screenshot source, usable as ScreenshotAnalyzer's capture_source.
+"""
+
+import random
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+Box = Tuple[int, int, int, int]
+
+
+class FakeScreen:
+    """Renders desktop-like frames (windows, text lines) without a display.
+
+    Calling the object returns the next frame. A new layout is drawn every
+    `change_every` calls, so 1 means the screen always changes and larger
+    values let the perceptual screen cache hit.
+
+    With several monitors the frame is the whole virtual desktop, side by
+    side, and the last window drawn is the foreground one. `active_window_box`,
+    `active_monitor_box` and `grab` stand in for the real region capture
+    functions, so RegionCapture can be exercised on any OS.
+    """
+
+    def __init__(self, width: int = 1920, height: int = 1080, change_every: int = 1, seed: int = 0, monitors: int = 1):
+        self.width = width
+        self.height = height
+        self.change_every = max(1, change_every)
+        self.seed = seed
+        self.monitors = max(1, monitors)
+        self.calls = 0
+        self.windows: List[Box] = []
+        self._frame = None
+
+    def __call__(self) -> Image.Image:
+        return self._next_frame().copy()
+
+    def _next_frame(self) -> Image.Image:
+        if self._frame is None or self.calls % self.change_every == 0:
+            self._frame = self.render(self.seed + self.calls // self.change_every)
+        self.calls += 1
+        return self._frame
+
+    def grab(self, box: Box) -> Image.Image:
+        """Capture one box of the next frame."""
+        return self._next_frame().crop(box)
+
+    def active_window_box(self) -> Optional[Box]:
+        """Foreground window of the frame the next capture returns."""
+        if self._frame is None or self.calls % self.change_every == 0:
+            self.render(self.seed + self.calls // self.change_every)
+        return self.windows[-1] if self.windows else None
+
+    def active_monitor_box(self) -> Optional[Box]:
+        window = self.active_window_box()
+        if window is None:
+            return None
+        left = window[0] // self.width * self.width
+        return left, 0, left + self.width, self.height
+
+    def render(self, frame: int) -> Image.Image:
+        rng = random.Random(frame)
+        image = Image.new("RGB", (self.width * self.monitors, self.height), self._color(rng, 200, 255))
+        draw = ImageDraw.Draw(image)
+        self.windows = []
+        for _ in range(rng.randint(2, 5)):
+            offset = rng.randrange(self.monitors) * self.width if self.monitors > 1 else 0
+            x0, y0 = offset + rng.randrange(self.width // 2), rng.randrange(self.height // 2)
+            x1 = min(offset + self.width, x0 + rng.randint(self.width // 4, self.width // 2))
+            y1 = min(self.height, y0 + rng.randint(self.height // 4, self.height // 2))
+            self.windows.append((x0, y0, x1, y1))
+            draw.rectangle((x0, y0, x1, y1), fill=self._color(rng, 0, 255), outline=(0, 0, 0))
+            draw.rectangle((x0, y0, x1, y0 + 24), fill=self._color(rng, 40, 120))
+            for y in range(y0 + 36, y1 - 12, 18):
+                width = rng.randint((x1 - x0) // 4, max((x1 - x0) // 4 + 1, x1 - x0 - 20))
+                draw.line((x0 + 10, y, x0 + 10 + width, y), fill=self._color(rng, 0, 90), width=8)
+        return image
+
+    @staticmethod
+    def _color(rng: random.Random, low: int, high: int) -> tuple:
+        return tuple(rng.randint(low, high) for _ in range(3))
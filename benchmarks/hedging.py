@@ -0,0 +1,158 @@
+"""
+Hedging and circuit breaker check against two local stub Ollama servers.
+
+The primary stub is slow and the secondary fast, so every call should be
+hedged, won by the secondary, and the primary's stream aborted. Then a
+provider pointed at a closed port should open its circuit, fail fast while
+it is open, hand the trial on when the first one is cancelled, and close
+again once a server answers the health probe.
+
+    python -m benchmarks.hedging --primary-latency 2 --secondary-latency 0.1
+
+Exits with status 1 when any check fails.
+"""
+
+import argparse
+import json
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.fake_screen import FakeScreen
+from benchmarks.run import latency_summary
+from benchmarks.stub_ollama import StubOllamaServer
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_hedging(args) -> dict:
+    from source.ai_providers import OllamaProvider
+    from source.config import Config
+    from source.hedging import HedgedProvider
+
+    # Keep the delay fixed below the primary's latency and leave room for the losers
+    Config.HEDGE_INITIAL_DELAY_SECONDS = args.hedge_delay
+    Config.HEDGE_MIN_SAMPLES = args.iterations * 2 + 1
+    Config.HEDGE_WORKERS = args.iterations * 2 + 2
+
+    screen = FakeScreen(1280, 720)
+    with StubOllamaServer(args.primary_latency, image_latency=0) as primary_stub, \
+            StubOllamaServer(args.secondary_latency, image_latency=0) as secondary_stub:
+        hedged = HedgedProvider(OllamaProvider(primary_stub.url), OllamaProvider(secondary_stub.url))
+        latencies = {"generate_quote": [], "analyze_screenshot": []}
+        failed = 0
+        for i in range(args.iterations):
+            # Fresh notes every time, so the primary can't answer fast from its prefix cache
+            for operation, call in (
+                ("generate_quote", lambda: hedged.generate_quote(f"notes {i}", "an editor")),
+                ("analyze_screenshot", lambda: hedged.analyze_screenshot(screen())),
+            ):
+                start = time.perf_counter()
+                failed += call().startswith("Error")
+                latencies[operation].append(time.perf_counter() - start)
+        # The primary notices the disconnect when it writes after its prefill
+        time.sleep(args.primary_latency + 1)
+        return {
+            "calls": hedged.calls,
+            "failed": failed,
+            "hedges_fired": hedged.hedges_fired,
+            "hedges_won": hedged.hedges_won,
+            "primary_aborted": primary_stub.aborted_streams,
+            "latency": {operation: latency_summary(samples) for operation, samples in latencies.items()},
+        }
+
+
+def bench_breaker(args) -> dict:
+    from source.ai_providers import OllamaProvider
+    from source.circuit_breaker import CircuitBreaker
+
+    port = free_port()
+    provider = OllamaProvider(f"http://127.0.0.1:{port}/api/generate")
+    provider.breaker.cooldown = args.cooldown
+
+    for _ in range(provider.breaker.min_calls):
+        provider.generate_quote("notes", "an editor")
+    opened = provider.breaker.state == CircuitBreaker.OPEN
+    start = time.perf_counter()
+    open_result = provider.generate_quote("notes", "an editor")
+    open_call_s = time.perf_counter() - start
+
+    with StubOllamaServer(args.secondary_latency, port=port) as stub:
+        time.sleep(args.cooldown)
+        # The first trial is cancelled while the server still reads the prompt
+        stub.latency = args.primary_latency
+        caller = threading.Thread(target=cancellable_quote, args=(provider, "notes for the cancelled trial"))
+        caller.start()
+        time.sleep(args.hedge_delay)
+        provider.cancel(caller.ident)
+        caller.join()
+        trial_released = provider.breaker.state == CircuitBreaker.OPEN
+        stub.latency = args.secondary_latency
+        recovered = not provider.generate_quote("notes", "an editor").startswith("Error")
+        return {
+            "opened": opened,
+            "open_call_s": round(open_call_s, 4),
+            "open_call_failed": open_result.startswith("Error"),
+            "cancelled_trial_released": trial_released,
+            "recovered": recovered,
+            "closed": provider.breaker.state == CircuitBreaker.CLOSED,
+            "requests_after_recovery": stub.requests,
+        }
+
+
+def cancellable_quote(provider, notes: str) -> str:
+    with provider.cancellable():
+        return provider.generate_quote(notes, "an editor")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedging and circuit breaker check")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--primary-latency", type=float, default=2.0)
+    parser.add_argument("--secondary-latency", type=float, default=0.1)
+    parser.add_argument("--hedge-delay", type=float, default=0.3)
+    parser.add_argument("--cooldown", type=float, default=0.5, help="breaker cooldown for the check")
+    parser.add_argument("--output", type=Path, help="also write the results here as JSON")
+    args = parser.parse_args()
+
+    results = {"hedging": bench_hedging(args), "breaker": bench_breaker(args)}
+    hedging, breaker = results["hedging"], results["breaker"]
+    checks = {
+        "every call hedged": hedging["hedges_fired"] == hedging["calls"],
+        "secondary won every hedge": hedging["hedges_won"] == hedging["calls"],
+        "primary aborted every time": hedging["primary_aborted"] == hedging["calls"],
+        "no failed calls": hedging["failed"] == 0,
+        "faster than the primary": all(
+            summary["p90_s"] < args.primary_latency for summary in hedging["latency"].values()
+        ),
+        "breaker opened": breaker["opened"],
+        "open breaker fails fast": breaker["open_call_failed"] and breaker["open_call_s"] < 0.1,
+        "cancelled trial released": breaker["cancelled_trial_released"],
+        "breaker recovered": breaker["recovered"] and breaker["closed"],
+    }
+    results["checks"] = checks
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(
+        f"Hedging: {hedging['hedges_fired']}/{hedging['calls']} fired, {hedging['hedges_won']} won by the secondary, "
+        f"{hedging['primary_aborted']} primary streams aborted; p50 "
+        + ", ".join(f"{op} {summary['p50_s']}s" for op, summary in hedging["latency"].items())
+    )
+    print(
+        f"Breaker: opened {breaker['opened']}, open call took {breaker['open_call_s']}s, "
+        f"recovered {breaker['recovered']}"
+    )
+    for name, ok in checks.items():
+        print(f"  {'ok' if ok else 'FAILED'}: {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
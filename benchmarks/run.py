@@ -0,0 +1,327 @@
+"""
+Offline benchmark of vault indexing and the notification pipeline.
+
+Everything runs locally: a synthetic vault, a stub Ollama server and a fake
+screen. Results are written as JSON (by default to
+benchmarks/results/<commit>.json) so runs can be compared between commits:
+
+    python -m benchmarks.run --notes 5000 --iterations 30
+    python -m benchmarks.run --compare benchmarks/results/<older commit>.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.fake_screen import FakeScreen
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.synthetic_vault import generate_vault, touch_notes, write_obsidian_config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples),
+        "mean_s": round(sum(samples) / len(samples), 4),
+        "min_s": round(min(samples), 4),
+        "p50_s": round(percentile(samples, 0.5), 4),
+        "p90_s": round(percentile(samples, 0.9), 4),
+        "p99_s": round(percentile(samples, 0.99), 4),
+        "max_s": round(max(samples), 4),
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_indexing(args, vault: Path) -> Dict[str, float]:
+    from source.context_manager import ObsidianContextManager
+
+    vault_bytes = sum(path.stat().st_size for path in vault.rglob("*.md"))
+    manager = ObsidianContextManager()
+
+    start = time.perf_counter()
+    manager.generate_context_snapshot()
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    manager.get_relevant_context("focus project deadline")
+    bm25_seconds = time.perf_counter() - start
+
+    queries = ["morning routine gym", "python code release", "budget money career", "sleep health energy"]
+    query_times = []
+    for i in range(args.queries):
+        start = time.perf_counter()
+        manager.get_relevant_context(queries[i % len(queries)])
+        query_times.append(time.perf_counter() - start)
+
+    edited = touch_notes(vault, args.edit_fraction)
+    start = time.perf_counter()
+    manager.generate_context_snapshot()
+    incremental_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    manager.generate_context_snapshot()
+    noop_seconds = time.perf_counter() - start
+
+    return {
+        "notes": len(manager.store),
+        "vault_mb": round(vault_bytes / 1e6, 2),
+        "full_index_s": round(full_seconds, 4),
+        "notes_per_s": round(args.notes / full_seconds, 1),
+        "mb_per_s": round(vault_bytes / 1e6 / full_seconds, 2),
+        "bm25_build_s": round(bm25_seconds, 4),
+        "query": latency_summary(query_times),
+        "edited_notes": edited,
+        "incremental_s": round(incremental_seconds, 4),
+        "noop_rescan_s": round(noop_seconds, 4),
+    }
+
+
+def bench_sharded_indexing(args, workdir: Path) -> Dict[str, float]:
+    """Index args.vaults vaults of args.notes notes in total, serially and with a process each."""
+    from source.config import Config
+    from source.vault_shards import ShardedContextManager
+
+    vaults = [
+        generate_vault(workdir / f"vault-{i}", args.notes // args.vaults, args.depth, args.fanout, args.words, seed=i)
+        for i in range(args.vaults)
+    ]
+    timings = {}
+    for label, processes in (("serial", 1), ("parallel", None)):
+        Config.VAULT_INDEX_PROCESSES = processes
+        manager = ShardedContextManager(vault_paths=vaults, store_path=workdir / f"shards-{label}.sqlite3")
+        start = time.perf_counter()
+        manager.generate_context_snapshot()
+        timings[label] = time.perf_counter() - start
+    Config.VAULT_INDEX_PROCESSES = None
+
+    start = time.perf_counter()
+    manager.get_relevant_context("focus project deadline")
+    query_seconds = time.perf_counter() - start
+
+    return {
+        "vaults": args.vaults,
+        "cores": os.cpu_count(),
+        "serial_s": round(timings["serial"], 4),
+        "parallel_s": round(timings["parallel"], 4),
+        "speedup": round(timings["serial"] / timings["parallel"], 2),
+        "first_query_s": round(query_seconds, 4),
+    }
+
+
+def bench_notifications(args, stub: StubOllamaServer) -> Dict[str, object]:
+    from source.config import Config
+
+    Config.OLLAMA_URL = stub.url
+    Config.PIPELINE_MODE = args.mode
+    Config.WATCH_VAULT = False
+    Config.OLLAMA_PRELOAD_ON_START = False
+    Config.HEDGING_ENABLED = False
+    Config.QUOTE_CACHE_ENABLED = args.caches
+    Config.SCREEN_CACHE_ENABLED = args.caches
+
+    from source.assistant_core import AIAssistant
+    from source.metrics import get_metrics
+    from source.screenshot import RegionCapture
+
+    assistant = AIAssistant(use_local_ai=True)
+    screen = FakeScreen(args.screen_width, args.screen_height, change_every=args.change_every, monitors=args.monitors)
+    if args.capture == "screen":
+        capture_source = screen
+    else:
+        locate = screen.active_window_box if args.capture == "window" else screen.active_monitor_box
+        capture_source = RegionCapture(locate, grab=screen.grab, fallback=screen)
+    pixels = []
+
+    def capture():
+        image = capture_source()
+        pixels.append(image.width * image.height)
+        return image
+
+    assistant.screenshot_analyzer.capture_source = capture
+    assistant.context_ready.wait()
+    assistant.warm_up(background=False)
+
+    latencies = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        assistant.send_notification()
+        latencies.append(time.perf_counter() - start)
+    assistant.shutdown()
+
+    return {
+        "mode": args.mode,
+        "caches": args.caches,
+        "capture": args.capture,
+        "mean_capture_pixels": round(sum(pixels) / len(pixels)) if pixels else 0,
+        "latency": latency_summary(latencies),
+        "stages": {
+            name: {key: round(value, 4) for key, value in stats.items()}
+            for name, stats in get_metrics().summary().items()
+        },
+        "stub_requests": stub.requests,
+        "stub_aborted_streams": stub.aborted_streams,
+    }
+
+
+def compare(current: Dict, previous: Dict) -> None:
+    """Print the relative change of the headline numbers."""
+    rows = [
+        ("indexing.notes_per_s", True),
+        ("indexing.incremental_s", False),
+        ("indexing.query.p50_s", False),
+        ("sharded_indexing.parallel_s", False),
+        ("notification.latency.p50_s", False),
+        ("notification.latency.p90_s", False),
+        ("notification.latency.p99_s", False),
+        ("memory.peak_rss_mb", False),
+    ]
+    print(f"{'metric':32} {previous.get('commit', '?'):>10} {current.get('commit', '?'):>10}  change")
+    for key, higher_is_better in rows:
+        old, new = previous, current
+        for part in key.split("."):
+            old = old.get(part, {}) if isinstance(old, dict) else {}
+            new = new.get(part, {}) if isinstance(new, dict) else {}
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+            continue
+        change = (new - old) / old
+        better = change > 0 if higher_is_better else change < 0
+        print(f"{key:32} {old:>10} {new:>10}  {change:+.1%}{'' if abs(change) < 0.05 else (' better' if better else ' WORSE')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of indexing and notifications")
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--words", type=int, default=200, help="mean words per note")
+    parser.add_argument("--vaults", type=int, default=1, help="also time indexing the notes split over this many vaults")
+    parser.add_argument("--edit-fraction", type=float, default=0.01, help="share of notes edited before the incremental run")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=20, help="notifications to time")
+    parser.add_argument("--mode", choices=["two_stage", "fused"], default="two_stage")
+    parser.add_argument("--caches", action="store_true", help="keep the quote and screen caches on")
+    parser.add_argument("--change-every", type=int, default=1, help="fake screen changes every N captures")
+    parser.add_argument("--screen-width", type=int, default=1920)
+    parser.add_argument("--screen-height", type=int, default=1080)
+    parser.add_argument("--monitors", type=int, default=1, help="fake monitors side by side")
+    parser.add_argument("--capture", choices=["screen", "window", "monitor"], default="screen",
+                        help="capture every monitor, the foreground window or its monitor")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="stub tokens per second")
+    parser.add_argument("--image-latency", type=float, default=0.3, help="stub extra seconds per image")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report Python heap peaks (slows the run)")
+    parser.add_argument("--output", type=Path, help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    # Configure logging before source.assistant_core's basicConfig can
+    logging.basicConfig(level=args.log_level, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    commit = git_commit()
+    output = (args.output or REPO_ROOT / "benchmarks" / "results" / f"{commit}.json").resolve()
+    results = {
+        "commit": commit,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "memory": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="motivation-bench-") as workdir:
+        workdir = Path(workdir)
+        # Store, caches and metrics files use relative paths; keep them out of the repo
+        os.chdir(workdir)
+
+        from source.config import Config
+        vault = generate_vault(workdir / "vault", args.notes, args.depth, args.fanout, args.words)
+        Config.OBSIDIAN_CONFIG_PATH = str(write_obsidian_config(workdir / "obsidian.json", vault))
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        results["indexing"] = bench_indexing(args, vault)
+        results["memory"]["rss_after_indexing_mb"] = peak_rss_mb()
+        if args.vaults > 1:
+            results["sharded_indexing"] = bench_sharded_indexing(args, workdir)
+        if args.tracemalloc:
+            results["memory"]["heap_peak_indexing_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+            if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+                tracemalloc.reset_peak()
+
+        with StubOllamaServer(args.latency, args.token_rate, args.image_latency) as stub:
+            results["notification"] = bench_notifications(args, stub)
+        results["memory"]["peak_rss_mb"] = peak_rss_mb()
+        if args.tracemalloc:
+            results["memory"]["heap_peak_notification_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+            tracemalloc.stop()
+        os.chdir(REPO_ROOT)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    indexing, notification = results["indexing"], results["notification"]["latency"]
+    print(
+        f"Indexing: {indexing['notes']} notes in {indexing['full_index_s']}s "
+        f"({indexing['notes_per_s']} notes/s, {indexing['mb_per_s']} MB/s), "
+        f"incremental {indexing['incremental_s']}s"
+    )
+    print(
+        f"Notification ({args.mode}): p50 {notification['p50_s']}s, "
+        f"p90 {notification['p90_s']}s, p99 {notification['p99_s']}s"
+    )
+    print(f"Capture ({args.capture}): {results['notification']['mean_capture_pixels']} pixels on average")
+    if "sharded_indexing" in results:
+        sharded = results["sharded_indexing"]
+        print(
+            f"{sharded['vaults']} vaults: serial {sharded['serial_s']}s, "
+            f"parallel {sharded['parallel_s']}s on {sharded['cores']} cores ({sharded['speedup']}x)"
+        )
+    print(f"Peak RSS: {results['memory']['peak_rss_mb']} MB")
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
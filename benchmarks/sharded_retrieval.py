@@ -0,0 +1,78 @@
+"""
+Retrieval check across two vaults on different topics.
+
+A query that matches only one vault should get only that vault's notes,
+not the other vault's recent notes in between; a query that matches
+neither should still fall back to recent notes, and one that matches both
+should get notes from both.
+
+    python -m benchmarks.sharded_retrieval --budget 400
+
+Exits with status 1 when any check fails.
+"""
+
+import argparse
+import json
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+TOPICS = {
+    "gym": "Squat workout plan: five sets at the gym, then a short run and stretching.",
+    "recipe": "Tomato pasta with garlic and basil; cook the sauce while the water boils.",
+}
+
+
+def write_vault(path: Path, topic: str, notes: int) -> Path:
+    path.mkdir(parents=True)
+    (path / ".obsidian").mkdir()
+    for i in range(notes):
+        (path / f"{topic}{i}.md").write_text(f"# {topic} {i}\n\n{TOPICS[topic]} Variation {i}.\n", encoding="utf-8")
+    return path
+
+
+def titles(context: str) -> List[str]:
+    return re.findall(r"^Назва файлу: (.+)$", context, flags=re.MULTILINE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-vault retrieval check")
+    parser.add_argument("--notes", type=int, default=5, help="notes per vault")
+    parser.add_argument("--budget", type=int, default=400, help="context token budget")
+    parser.add_argument("--output", type=Path, help="also write the results here as JSON")
+    args = parser.parse_args()
+
+    from source.vault_shards import ShardedContextManager
+
+    with tempfile.TemporaryDirectory(prefix="motivation-retrieval-") as workdir:
+        workdir = Path(workdir)
+        vaults = [write_vault(workdir / topic, topic, args.notes) for topic in TOPICS]
+        manager = ShardedContextManager(vault_paths=vaults, store_path=workdir / "store.sqlite3")
+        manager.generate_context_snapshot()
+        results = {
+            query: titles(manager.get_relevant_context(query, args.budget))
+            for query in ("gym squat workout", "telescope astronomy", "garlic run")
+        }
+
+    checks = {
+        "one vault matched: only its notes": bool(results["gym squat workout"])
+        and all(title.startswith("gym") for title in results["gym squat workout"]),
+        "no vault matched: recent notes": bool(results["telescope astronomy"]),
+        "both vaults matched: notes from both": {title.rstrip("0123456789") for title in results["garlic run"]}
+        == set(TOPICS),
+    }
+    results["checks"] = checks
+
+    if args.output:
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    for query in ("gym squat workout", "telescope astronomy", "garlic run"):
+        print(f"{query!r}: {', '.join(results[query]) or 'nothing'}")
+    for name, ok in checks.items():
+        print(f"  {'ok' if ok else 'FAILED'}: {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
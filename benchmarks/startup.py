@@ -0,0 +1,114 @@
+"""
+Startup-time benchmark: how long until the app can show its tray icon and
+until the notes are indexed, against a synthetic vault and a stub Ollama.
+
+    python -m benchmarks.startup --notes 5000 --target 1.0
+
+Exits with status 1 when time-to-ready exceeds the target, so it can gate
+changes that would stall the desktop at login.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.run import REPO_ROOT, git_commit
+from benchmarks.stub_ollama import StubOllamaServer
+from benchmarks.synthetic_vault import generate_vault, write_obsidian_config
+
+HEAVY_MODULES = ("google.generativeai", "PIL", "pyautogui", "requests", "numpy")
+
+IMPORT_PROBE = (
+    "import sys, time, json\n"
+    "start = time.perf_counter()\n"
+    "import source.assistant_core\n"
+    "elapsed = time.perf_counter() - start\n"
+    f"print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+)
+
+
+def measure_import(repeats: int) -> dict:
+    """Import time of the app core in fresh interpreters (no warm module cache)."""
+    samples, loaded = [], []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(out)
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"median_s": round(statistics.median(samples), 4), "max_s": round(max(samples), 4), "heavy_modules_loaded": loaded}
+
+
+def measure_init(workdir: Path, notes: int) -> dict:
+    """Construct AIAssistant on an unindexed vault; time the constructor and the background indexing."""
+    from source.config import Config
+
+    vault = generate_vault(workdir / "vault", notes)
+    Config.OBSIDIAN_CONFIG_PATH = str(write_obsidian_config(workdir / "obsidian.json", vault))
+    Config.WATCH_VAULT = False
+    Config.HEDGING_ENABLED = False
+
+    with StubOllamaServer() as stub:
+        Config.OLLAMA_URL = stub.url
+        from source.assistant_core import AIAssistant
+
+        start = time.perf_counter()
+        assistant = AIAssistant(use_local_ai=True)
+        init_seconds = time.perf_counter() - start
+        assistant.context_ready.wait()
+        ready_seconds = time.perf_counter() - start
+        assistant.shutdown()
+
+    return {
+        "notes": notes,
+        "init_s": round(init_seconds, 4),
+        "context_ready_s": round(ready_seconds, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-time benchmark")
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters for the import measurement")
+    parser.add_argument("--target", type=float, default=1.0, help="max seconds for import + AIAssistant()")
+    parser.add_argument("--output", type=Path, help="results file (default benchmarks/results/startup-<commit>.json)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output = (args.output or REPO_ROOT / "benchmarks" / "results" / f"startup-{commit}.json").resolve()
+    results = {"commit": commit, "timestamp": time.time(), "target_s": args.target}
+    results["import"] = measure_import(args.repeats)
+
+    with tempfile.TemporaryDirectory(prefix="motivation-startup-") as workdir:
+        os.chdir(workdir)
+        results["init"] = measure_init(Path(workdir), args.notes)
+        os.chdir(REPO_ROOT)
+
+    ready = results["import"]["median_s"] + results["init"]["init_s"]
+    results["time_to_ready_s"] = round(ready, 4)
+    results["within_target"] = ready <= args.target
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    print(
+        f"Import {results['import']['median_s']}s "
+        f"(heavy modules loaded: {', '.join(results['import']['heavy_modules_loaded']) or 'none'}), "
+        f"AIAssistant() {results['init']['init_s']}s, "
+        f"notes indexed after {results['init']['context_ready_s']}s"
+    )
+    print(f"Time to ready: {ready:.3f}s (target {args.target}s) - {'OK' if results['within_target'] else 'TOO SLOW'}")
+    print(f"Results written to {output}")
+    sys.exit(0 if results["within_target"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Deterministic stand-in for an embedding model: hashed bag of words.
+
+Texts that share words get similar vectors, which is enough to exercise the
+embedding store and its search without a model. Used in process by
+HashingEmbedder and over HTTP by StubOllamaServer's /api/embed.
+"""
+
+import re
+import zlib
+from typing import List
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def hashed_embedding(text: str, dim: int = 384) -> List[float]:
+    """Signed feature hashing of the lowercase words of text."""
+    vector = [0.0] * dim
+    for word in _WORD_RE.findall(text.lower()):
+        digest = zlib.crc32(word.encode("utf-8"))
+        vector[digest % dim] += 1.0 if digest & 0x80000000 else -1.0
+    return vector
+
+
+class HashingEmbedder:
+    """In-process embedder with the interface of source.embeddings.OllamaEmbedder."""
+
+    def __init__(self, dim: int = 384, model: str = "stub-embed"):
+        self.dim = dim
+        self.model = model
+        self.calls = 0
+
+    def embed(self, texts: List[str]):
+        import numpy as np
+
+        self.calls += 1
+        return np.asarray([hashed_embedding(text, self.dim) for text in texts], dtype=np.float32)
@@ -0,0 +1,218 @@
+"""
+Local stand-in for the Ollama HTTP API with configurable latency and token rate.
+
+Serves /api/generate and /api/chat (streaming and non-streaming, text and
+vision; chat reuses an unchanged system prompt like Ollama's KV cache),
+/api/embed (hashed bag-of-words vectors), /api/version and /api/tags, so the
+real OllamaProvider can be benchmarked without a GPU or network. Run standalone with:
+
+    python -m benchmarks.stub_ollama --port 11434 --latency 0.5 --token-rate 40
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.stub_embedder import hashed_embedding
+
+QUOTE_TOKENS = ["Close", " the", " feed", " and", " open", " the", " project", ",", " now", "."]
+FILLER_TOKENS = [" You", " know", " what", " matters", "."]
+DESCRIPTION = (
+    "A code editor with a Python file open, a terminal panel at the bottom "
+    "and a browser window with documentation on the right."
+)
+
+
+class StubOllamaServer:
+    """Threaded HTTP server imitating Ollama's timing characteristics.
+
+    :param latency: Seconds before the first token (prompt evaluation of an uncached prompt).
+    :param token_rate: Generated tokens per second.
+    :param image_latency: Extra seconds of prompt evaluation per attached image.
+    :param extra_tokens: Tokens generated after the first sentence if the client keeps reading.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        token_rate: float = 50.0,
+        image_latency: float = 0.3,
+        extra_tokens: int = 40,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.image_latency = image_latency
+        self.extra_tokens = extra_tokens
+        self.requests = 0
+        self.aborted_streams = 0
+        self.prefix_hits = 0
+        self._last_prefix = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        """Value for Config.OLLAMA_URL."""
+        return f"http://{self._server.server_address[0]}:{self.port}/api/generate"
+
+    def start(self) -> "StubOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _tokens_for(self, body: dict) -> list:
+        if body.get("prompt", "").startswith("Describe"):
+            # Two-stage vision call: a description, not a quote
+            return [word + " " for word in DESCRIPTION.split()]
+        return QUOTE_TOKENS + FILLER_TOKENS * (self.extra_tokens // len(FILLER_TOKENS))
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, data: dict) -> None:
+                out = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._send_json({"version": "stub"})
+                elif self.path == "/api/tags":
+                    self._send_json({"models": [{"name": "stub:latest"}]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path not in ("/api/generate", "/api/chat", "/api/embed"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+
+                if self.path == "/api/embed":
+                    texts = body.get("input", [])
+                    texts = [texts] if isinstance(texts, str) else texts
+                    self._send_json({"model": body.get("model"), "embeddings": [hashed_embedding(t) for t in texts]})
+                    return
+
+                chat = self.path == "/api/chat"
+                if chat:
+                    messages = body.get("messages", [])
+                    prefix = "".join(m.get("content", "") for m in messages if m.get("role") == "system")
+                    body["prompt"] = prefix + "".join(m.get("content", "") for m in messages if m.get("role") != "system")
+                    body["images"] = [image for m in messages for image in m.get("images", [])]
+                    # Like Ollama's runner, reuse the KV of a system prompt identical to the last one
+                    with stub._lock:
+                        cached = stub._last_prefix.get(body.get("model")) == prefix
+                        stub._last_prefix[body.get("model")] = prefix
+                        stub.prefix_hits += cached
+                    cached_chars = len(prefix) if cached else 0
+                else:
+                    cached_chars = 0
+
+                if "prompt" not in body:
+                    # Model load request
+                    self._send_json({"model": body.get("model"), "done": True})
+                    return
+
+                prompt_chars = max(1, len(body["prompt"]))
+                prompt_tokens = (prompt_chars - cached_chars) // 4
+                prefill = stub.latency * (prompt_chars - cached_chars) / prompt_chars
+                time.sleep(prefill + stub.image_latency * len(body.get("images", [])))
+                tokens = stub._tokens_for(body)
+                limit = body.get("options", {}).get("num_predict")
+                if limit:
+                    tokens = tokens[:limit]
+                token_delay = 1.0 / stub.token_rate if stub.token_rate > 0 else 0.0
+
+                def content(text: str) -> dict:
+                    return {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+
+                if not body.get("stream", True):
+                    time.sleep(token_delay * len(tokens))
+                    self._send_json({
+                        **content("".join(tokens)),
+                        "done": True,
+                        "prompt_eval_count": prompt_tokens,
+                        "prompt_eval_duration": int(prefill * 1e9),
+                        "eval_count": len(tokens),
+                        "eval_duration": int(token_delay * len(tokens) * 1e9),
+                    })
+                    return
+
+                try:
+                    # The client may already be gone if it cancelled during the prefill
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for token in tokens:
+                        time.sleep(token_delay)
+                        self._write_chunk({**content(token), "done": False})
+                    self._write_chunk({**content(""), "done": True, "eval_count": len(tokens)})
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading after the first sentence
+                    with stub._lock:
+                        stub.aborted_streams += 1
+                    self.close_connection = True
+
+            def _write_chunk(self, data: dict) -> None:
+                line = (json.dumps(data) + "\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="tokens per second")
+    parser.add_argument("--image-latency", type=float, default=0.3, help="extra seconds per image")
+    args = parser.parse_args()
+
+    server = StubOllamaServer(args.latency, args.token_rate, args.image_latency, host=args.host, port=args.port)
+    print(f"Stub Ollama listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
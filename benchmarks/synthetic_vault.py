@@ -0,0 +1,113 @@
+"""
+Generator of synthetic Obsidian vaults of configurable size and folder depth.
+
+    python -m benchmarks.synthetic_vault /tmp/vault --notes 5000 --depth 4
+"""
+
+import argparse
+import json
+import os
+import random
+from pathlib import Path
+from typing import List
+
+WORDS = (
+    "goal habit focus project deadline morning routine gym run read book write code "
+    "python learn plan week month review idea draft note journal sleep health money "
+    "budget career interview portfolio design ship release feedback practice guitar "
+    "language lesson meditation walk family friend travel energy discipline progress"
+).split()
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _note_body(rng: random.Random, title: str, words: int, titles: List[str]) -> str:
+    parts = [f"# {title}", ""]
+    remaining = words
+    while remaining > 0:
+        size = min(remaining, rng.randint(20, 80))
+        parts.append(_paragraph(rng, size))
+        parts.append("")
+        remaining -= size
+    if titles:
+        links = rng.sample(titles, min(3, len(titles)))
+        parts.append("Related: " + ", ".join(f"[[{link}]]" for link in links))
+    return "\n".join(parts) + "\n"
+
+
+def generate_vault(
+    root: Path,
+    notes: int = 1000,
+    depth: int = 3,
+    fanout: int = 4,
+    words_per_note: int = 200,
+    seed: int = 0
+) -> Path:
+    """Write `notes` markdown notes spread over a folder tree `depth` levels deep.
+
+    The same arguments always produce the same vault, so runs are comparable.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    (root / ".obsidian").mkdir(exist_ok=True)
+
+    folders = [root]
+    level = [root]
+    for d in range(depth):
+        level = [folder / f"area-{d}-{i}" for folder in level for i in range(fanout)]
+        folders.extend(level)
+    for folder in folders:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    titles: List[str] = []
+    for n in range(notes):
+        title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {n}"
+        words = max(10, int(rng.gauss(words_per_note, words_per_note / 3)))
+        folder = rng.choice(folders)
+        (folder / f"{title}.md").write_text(_note_body(rng, title, words, titles[-50:]), encoding="utf-8")
+        titles.append(title)
+    return root
+
+
+def touch_notes(root: Path, fraction: float, seed: int = 1) -> int:
+    """Append a line to a fraction of the notes, as a day of editing would."""
+    rng = random.Random(seed)
+    paths = sorted(Path(root).rglob("*.md"))
+    edited = rng.sample(paths, max(1, int(len(paths) * fraction))) if paths else []
+    for path in edited:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"\n{_paragraph(rng, 15)}\n")
+    return len(edited)
+
+
+def write_obsidian_config(config_path: Path, vault: Path) -> Path:
+    """Write an obsidian.json that points ObsidianContextManager at `vault`."""
+    config_path = Path(config_path)
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    config_path.write_text(
+        json.dumps({"vaults": {"benchmark": {"path": os.fspath(vault), "ts": 0, "open": True}}}),
+        encoding="utf-8"
+    )
+    return config_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Obsidian vault")
+    parser.add_argument("root", type=Path)
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--words", type=int, default=200, help="mean words per note")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_vault(args.root, args.notes, args.depth, args.fanout, args.words, args.seed)
+    print(f"Wrote {args.notes} notes to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Embedding store benchmark: sync throughput and top-k search latency over a
+synthetic vault, with the in-process hashing embedder (no model needed).
+
+    python -m benchmarks.vector_search --notes 100000 --dim 768
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.run import REPO_ROOT, git_commit, latency_summary, peak_rss_mb
+from benchmarks.stub_embedder import HashingEmbedder
+from benchmarks.synthetic_vault import generate_vault, touch_notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding store benchmark")
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=120, help="mean words per note (about one chunk)")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--edit-fraction", type=float, default=0.01)
+    parser.add_argument("--output", type=Path, help="results file (default benchmarks/results/vectors-<commit>.json)")
+    args = parser.parse_args()
+
+    from source.context_manager import ObsidianContextManager
+    from source.embeddings import EmbeddingIndex
+
+    commit = git_commit()
+    output = (args.output or REPO_ROOT / "benchmarks" / "results" / f"vectors-{commit}.json").resolve()
+    results = {"commit": commit, "timestamp": time.time(), "params": vars(args) | {"output": str(output)}}
+
+    with tempfile.TemporaryDirectory(prefix="motivation-vectors-") as workdir:
+        workdir = Path(workdir)
+        os.chdir(workdir)
+        vault = generate_vault(workdir / "vault", args.notes, words_per_note=args.words)
+        manager = ObsidianContextManager(vault_path=vault, store_path=workdir / "store.sqlite3")
+        manager.generate_context_snapshot()
+
+        embedder = HashingEmbedder(args.dim)
+        matrix_path = workdir / "store.vectors.f32"
+        index = EmbeddingIndex(manager.store, embedder, matrix_path)
+        start = time.perf_counter()
+        index.sync()
+        sync_seconds = time.perf_counter() - start
+
+        touch_notes(vault, args.edit_fraction)
+        manager.generate_context_snapshot()
+        start = time.perf_counter()
+        reembedded = index.sync()
+        incremental_seconds = time.perf_counter() - start
+
+        # Reopen from disk, as the app does on start
+        start = time.perf_counter()
+        index = EmbeddingIndex(manager.store, embedder, matrix_path)
+        load_seconds = time.perf_counter() - start
+
+        queries = ["morning routine gym", "python code release", "budget money career", "sleep health energy"]
+        vectors = [index._embed([query])[0] for query in queries]
+        index.search_vector(vectors[0], args.top_k)
+        times = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            index.search_vector(vectors[i % len(vectors)], args.top_k)
+            times.append(time.perf_counter() - start)
+
+        results.update({
+            "chunks": len(index),
+            "matrix_mb": round(matrix_path.stat().st_size / 1e6, 1),
+            "sync_s": round(sync_seconds, 2),
+            "chunks_per_s": round(len(index) / sync_seconds, 1),
+            "edited_chunks_reembedded": reembedded,
+            "incremental_sync_s": round(incremental_seconds, 3),
+            "load_s": round(load_seconds, 3),
+            "search": latency_summary(times),
+            "peak_rss_mb": peak_rss_mb(),
+        })
+        os.chdir(REPO_ROOT)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    search = results["search"]
+    print(
+        f"{results['chunks']} chunks x {args.dim} ({results['matrix_mb']} MB): "
+        f"search p50 {search['p50_s'] * 1000:.1f}ms p99 {search['p99_s'] * 1000:.1f}ms, "
+        f"reopen {results['load_s']}s, incremental sync {results['incremental_sync_s']}s "
+        f"({reembedded} chunks re-embedded)"
+    )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,23 @@
 import sys
 import os
 import json
-import random
+import multiprocessing
 import signal
 import ctypes
 import subprocess
+import threading
+import time
 from typing import Dict, Any, Optional
 
 import win32com.client
 from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import QTimer, QObject, QRunnable, QThreadPool, pyqtSignal
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QRadioButton, QButtonGroup, QMessageBox, QComboBox
 
-from source.assistant_core import AIAssistant
+from source.activity import ActivityScheduler
+from source.assistant_core import AIAssistant, NotificationCancelled, PreparedNotification
+from source.config import Config
 
 
 class SettingsManager:
@@ -82,25 +86,114 @@ class AutostartManager:
 
 
 class NotificationScheduler:
-    """Handles notification scheduling logic."""
+    """Handles notification scheduling logic.
     
-    HOUR_MS = 60 * 60 * 1000
-    NOTIFICATIONS_PER_HOUR = 2
+    Slots follow each other at random, activity-adapted intervals; a slot only
+    runs the pipeline if the ActivityScheduler finds the user at the screen.
+    """
     
-    def __init__(self, show_message_callback):
+    def __init__(self, show_message_callback, prefetch_callback=None, lead_time_callback=None, activity=None):
         self.show_message_callback = show_message_callback
+        self.prefetch_callback = prefetch_callback
+        self.lead_time_callback = lead_time_callback
+        self.activity = activity or ActivityScheduler()
+        # Decision for the current slot, made at its first callback (the prefetch, if any)
+        self._slot_allowed: Optional[bool] = None
     
     def schedule_notifications(self) -> None:
-        """Schedule random notifications within the next hour."""
-        notification_times = sorted([
-            random.randint(0, self.HOUR_MS) 
-            for _ in range(self.NOTIFICATIONS_PER_HOUR)
-        ])
+        """Schedule the next notification, prefetched ahead of its slot; each slot schedules the next one."""
+        delay_ms = int(self.activity.next_delay() * 1000)
+        self._slot_allowed = None
         
-        for time_ms in notification_times:
-            QTimer.singleShot(time_ms, self.show_message_callback)
+        lead_ms = 0
+        if self.prefetch_callback and self.lead_time_callback:
+            lead_ms = int(self.lead_time_callback() * 1000)
         
-        QTimer.singleShot(self.HOUR_MS, self.schedule_notifications)
+        if lead_ms:
+            QTimer.singleShot(max(0, delay_ms - lead_ms), self._prefetch_slot)
+        QTimer.singleShot(delay_ms, self._show_slot)
+    
+    def _slot_allowed_now(self) -> bool:
+        if self._slot_allowed is None:
+            self._slot_allowed = self.activity.should_run()
+        return self._slot_allowed
+    
+    def _prefetch_slot(self) -> None:
+        if self._slot_allowed_now():
+            self.prefetch_callback()
+    
+    def _show_slot(self) -> None:
+        try:
+            if self._slot_allowed_now():
+                self.show_message_callback()
+        finally:
+            self.schedule_notifications()
+
+
+class NotificationRequest:
+    """A single in-flight notification with its cancellation flag and deadline."""
+    
+    def __init__(self, kind: str, icon, timeout_seconds: float, due: bool = True):
+        self.kind = kind
+        self.icon = icon
+        self.cancel_event = threading.Event()
+        self.deadline = time.monotonic() + timeout_seconds
+        # Prefetched requests are generated early and only shown once due
+        self.due = due
+        self.prepared: Optional[PreparedNotification] = None
+        self.running = True
+        # Pool thread running the pipeline, so its provider call can be aborted
+        self.thread_id: Optional[int] = None
+    
+    def cancel(self) -> None:
+        """Abandon the request; its result will not be shown."""
+        self.cancel_event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+
+class NotificationSignals(QObject):
+    """Signals used by workers to hand results back to the GUI thread."""
+    
+    finished = pyqtSignal(object, object)
+
+
+class NotificationWorker(QRunnable):
+    """Runs the notification pipeline on a thread pool worker."""
+    
+    def __init__(self, ai: AIAssistant, request: NotificationRequest, signals: NotificationSignals):
+        super().__init__()
+        self.ai = ai
+        self.request = request
+        self.signals = signals
+    
+    def run(self) -> None:
+        """Generate (or re-check a prefetched) message and emit it back to the GUI thread."""
+        self.request.thread_id = threading.get_ident()
+        try:
+            with self.ai.ai_provider.cancellable():
+                if self.request.prepared is not None:
+                    prepared = self.ai.revalidate_notification(
+                        self.request.prepared,
+                        cancel_event=self.request.cancel_event,
+                        deadline=self.request.deadline
+                    )
+                else:
+                    prepared = self.ai.prepare_notification(
+                        cancel_event=self.request.cancel_event,
+                        deadline=self.request.deadline
+                    )
+        except NotificationCancelled as e:
+            print(f"Notification ({self.request.kind}) dropped: {e}")
+            return
+        except Exception as e:
+            print(f"Error generating notification: {e}")
+            return
+        finally:
+            self.request.thread_id = None
+        self.signals.finished.emit(self.request, prepared)
 
 
 class MotivationAssistant:
@@ -112,10 +205,18 @@ class MotivationAssistant:
         self.ai: Optional[AIAssistant] = None
         self.menu: Optional[QMenu] = None
         self.timer: Optional[QTimer] = None
+        self.progress_timer: Optional[QTimer] = None
+        self.thread_pool: Optional[QThreadPool] = None
+        self.notification_signals: Optional[NotificationSignals] = None
+        self.pending_requests: Dict[str, NotificationRequest] = {}
         
         self.settings_manager = SettingsManager()
         self.autostart_manager = AutostartManager()
-        self.notification_scheduler = NotificationScheduler(self.show_ai_message)
+        self.notification_scheduler = NotificationScheduler(
+            self.show_ai_message,
+            prefetch_callback=self.prefetch_ai_message if Config.PREFETCH_ENABLED else None,
+            lead_time_callback=lambda: self.ai.prefetch_lead_time() if self.ai else 0
+        )
         
         self.action_autostart: Optional[QAction] = None
         self.action_show: Optional[QAction] = None
@@ -133,6 +234,11 @@ class MotivationAssistant:
         self.app = QApplication(sys.argv)
         self.app.setQuitOnLastWindowClosed(False)
         
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(Config.NOTIFICATION_WORKERS)
+        self.notification_signals = NotificationSignals()
+        self.notification_signals.finished.connect(self._on_notification_ready)
+        
         signal.signal(signal.SIGINT, self._signal_handler)
     
     def prompt_for_ai_provider(self):
@@ -284,6 +390,7 @@ class MotivationAssistant:
         icon_path = os.path.join(basedir, "icon.png")
         
         self.tray = QSystemTrayIcon(QIcon(icon_path))
+        self.tray.setToolTip("Motivation Assistant")
         self.tray.setVisible(True)
         
         self._setup_context_menu()
@@ -315,10 +422,13 @@ class MotivationAssistant:
         """Show dialog to change AI provider and re-initialize assistant."""
         self.prompt_for_ai_provider()
         try:
-            self.ai = AIAssistant(
+            new_ai = AIAssistant(
                 gemini_api_key=self.settings.get("gemini_api_key"),
                 use_local_ai=self.settings.get("use_local_model", False)
             )
+            if self.ai:
+                self.ai.shutdown()
+            self.ai = new_ai
         except Exception as e:
             QMessageBox.critical(None, "Error", f"Failed to change AI provider: {e}")
 
@@ -327,34 +437,98 @@ class MotivationAssistant:
         self.timer = QTimer()
         self.timer.timeout.connect(lambda: None)
         self.timer.start(100)
+        
+        self.progress_timer = QTimer()
+        self.progress_timer.timeout.connect(self._update_indexing_progress)
+        self.progress_timer.start(1000)
+    
+    def _update_indexing_progress(self) -> None:
+        """Show the initial indexing progress in the tray tooltip until it finishes."""
+        if not (self.ai and self.tray):
+            return
+        progress = self.ai.indexing_progress()
+        if progress is None:
+            self.tray.setToolTip("Motivation Assistant")
+            self.progress_timer.stop()
+            return
+        done, total = progress
+        status = f"{done}/{total} notes" if total else "scanning vault"
+        self.tray.setToolTip(f"Motivation Assistant - indexing notes ({status})")
     
     def show_message(self) -> None:
         """Show a motivation message via manual trigger."""
-        if self.ai and self.tray:
-            try:
-                message = self.ai.send_notification()
-                self.tray.showMessage(
-                    "Motivation Assistant", 
-                    message, 
-                    QSystemTrayIcon.Critical, 
-                    3000
-                )
-            except Exception as e:
-                print(f"Error showing message: {e}")
+        self._request_notification("manual", QSystemTrayIcon.Critical)
     
     def show_ai_message(self) -> None:
         """Show a motivation message via scheduled notification."""
-        if self.ai and self.tray:
-            try:
-                message = self.ai.send_notification()
-                self.tray.showMessage(
-                    "Motivation Assistant", 
-                    message, 
-                    QSystemTrayIcon.Information, 
-                    3000
-                )
-            except Exception as e:
-                print(f"Error showing AI message: {e}")
+        request = self.pending_requests.get("scheduled")
+        if request and not request.due:
+            # Prefetched for this slot: show it now, or as soon as it is ready
+            request.due = True
+            if request.prepared is not None and not request.running:
+                self._start_worker(request)
+            return
+        self._request_notification("scheduled", QSystemTrayIcon.Information)
+    
+    def prefetch_ai_message(self) -> None:
+        """Start generating the next scheduled notification ahead of its slot."""
+        lead_time = self.ai.prefetch_lead_time() if self.ai else 0
+        self._request_notification("scheduled", QSystemTrayIcon.Information, due=False, lead_time=lead_time)
+    
+    def _request_notification(self, kind: str, icon, due: bool = True, lead_time: float = 0) -> None:
+        """Start the notification pipeline in the background, replacing a pending one of the same kind."""
+        if not (self.ai and self.tray and self.thread_pool):
+            return
+        
+        previous = self.pending_requests.get(kind)
+        if previous:
+            previous.cancel()
+        
+        request = NotificationRequest(kind, icon, lead_time + Config.NOTIFICATION_DEADLINE_SECONDS, due=due)
+        self.pending_requests[kind] = request
+        self._start_worker(request)
+    
+    def _start_worker(self, request: NotificationRequest) -> None:
+        """Run the request on the pool and expire it if it outlives its deadline."""
+        if request.due:
+            request.deadline = max(request.deadline, time.monotonic() + Config.NOTIFICATION_DEADLINE_SECONDS)
+        request.running = True
+        self.thread_pool.start(NotificationWorker(self.ai, request, self.notification_signals))
+        QTimer.singleShot(
+            int((request.deadline - time.monotonic()) * 1000) + 1,
+            lambda: self._expire_request(request)
+        )
+    
+    def _expire_request(self, request: NotificationRequest) -> None:
+        """Cancel a request that is still running when its deadline passes."""
+        if self.pending_requests.get(request.kind) is request and request.running and time.monotonic() >= request.deadline:
+            request.cancel()
+            del self.pending_requests[request.kind]
+            print(f"Notification ({request.kind}) exceeded its deadline")
+            thread_id = request.thread_id
+            if thread_id is not None:
+                # Free the pool worker now instead of when the model call times out;
+                # closing the connection can block, so keep it off the GUI thread
+                threading.Thread(target=self.ai.ai_provider.cancel, args=(thread_id,), daemon=True).start()
+    
+    def _on_notification_ready(self, request: NotificationRequest, prepared: PreparedNotification) -> None:
+        """Show a finished notification when due; keep a prefetched one until its slot."""
+        request.running = False
+        if request.cancelled or self.pending_requests.get(request.kind) is not request:
+            return
+        request.prepared = prepared
+        if not request.due:
+            return
+        del self.pending_requests[request.kind]
+        try:
+            self.tray.showMessage(
+                "Motivation Assistant", 
+                prepared.message, 
+                request.icon, 
+                3000
+            )
+        except Exception as e:
+            print(f"Error showing message: {e}")
 
     
     
@@ -367,6 +541,13 @@ class MotivationAssistant:
     
     def quit_application(self) -> None:
         """Quit the application gracefully."""
+        for request in self.pending_requests.values():
+            request.cancel()
+        self.pending_requests.clear()
+        if self.thread_pool:
+            self.thread_pool.clear()
+        if self.ai:
+            self.ai.shutdown()
         if self.app:
             self.app.quit()
     
@@ -378,8 +559,9 @@ class MotivationAssistant:
         """Run the application."""
         try:
             self.setup_application()
-            self.setup_ai_assistant()
+            # Show the icon first; provider setup and indexing must not delay it
             self.setup_system_tray()
+            self.setup_ai_assistant()
             self.setup_timer()
             
             self.notification_scheduler.schedule_notifications()
@@ -398,4 +580,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Vault indexing processes re-enter here in the frozen build
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
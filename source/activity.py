@@ -0,0 +1,242 @@
+import ctypes
+import random
+import sys
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+from source.config import Config
+from source.metrics import get_metrics
+from source.screen_cache import dhash, hamming_distance
+import logging
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def windows_idle_seconds() -> Optional[float]:
+    """Seconds since the last keyboard or mouse input; None if unknown."""
+    if sys.platform != "win32":
+        return None
+
+    class LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+    info = LASTINPUTINFO()
+    info.cbSize = ctypes.sizeof(info)
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        return None
+    # Both are 32-bit tick counts that wrap after 49 days
+    return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000
+
+
+def windows_session_locked() -> Optional[bool]:
+    """Whether the lock screen (or another secure desktop) has the input; None if unknown."""
+    if sys.platform != "win32":
+        return None
+    user32 = ctypes.windll.user32
+    user32.OpenInputDesktop.restype = ctypes.c_void_p
+    desktop = user32.OpenInputDesktop(0, False, 0x0100)  # DESKTOP_SWITCHDESKTOP
+    if not desktop:
+        # The Winlogon desktop can't be opened from the user session
+        return True
+    try:
+        return not user32.SwitchDesktop(ctypes.c_void_p(desktop))
+    finally:
+        user32.CloseDesktop(ctypes.c_void_p(desktop))
+
+
+def windows_on_battery() -> Optional[bool]:
+    """Whether the machine runs on battery; None if unknown or a desktop."""
+    if sys.platform != "win32":
+        return None
+
+    class SYSTEM_POWER_STATUS(ctypes.Structure):
+        _fields_ = [
+            ("ACLineStatus", ctypes.c_ubyte),
+            ("BatteryFlag", ctypes.c_ubyte),
+            ("BatteryLifePercent", ctypes.c_ubyte),
+            ("SystemStatusFlag", ctypes.c_ubyte),
+            ("BatteryLifeTime", ctypes.c_ulong),
+            ("BatteryFullLifeTime", ctypes.c_ulong),
+        ]
+
+    status = SYSTEM_POWER_STATUS()
+    if not ctypes.windll.kernel32.GetSystemPowerStatus(ctypes.byref(status)) or status.ACLineStatus == 255:
+        return None
+    return status.ACLineStatus == 0
+
+
+def windows_screen_thumbnail(width: int = 64, height: int = 36) -> Optional["Image.Image"]:
+    """The whole virtual desktop shrunk by GDI into a tiny image; None if unsupported.
+
+    Costs a few milliseconds even across several monitors, unlike a
+    full-size grab, so it can run on the GUI thread.
+    """
+    if sys.platform != "win32":
+        return None
+    from ctypes import wintypes
+    from PIL import Image
+
+    class BITMAPINFOHEADER(ctypes.Structure):
+        _fields_ = [
+            ("biSize", wintypes.DWORD),
+            ("biWidth", wintypes.LONG),
+            ("biHeight", wintypes.LONG),
+            ("biPlanes", wintypes.WORD),
+            ("biBitCount", wintypes.WORD),
+            ("biCompression", wintypes.DWORD),
+            ("biSizeImage", wintypes.DWORD),
+            ("biXPelsPerMeter", wintypes.LONG),
+            ("biYPelsPerMeter", wintypes.LONG),
+            ("biClrUsed", wintypes.DWORD),
+            ("biClrImportant", wintypes.DWORD),
+        ]
+
+    user32, gdi32 = ctypes.windll.user32, ctypes.windll.gdi32
+    # Handles are pointer-sized; declare them so 64-bit values aren't truncated to int
+    user32.GetDC.restype = wintypes.HDC
+    user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+    gdi32.CreateCompatibleDC.restype = wintypes.HDC
+    gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+    gdi32.CreateCompatibleBitmap.restype = wintypes.HBITMAP
+    gdi32.CreateCompatibleBitmap.argtypes = [wintypes.HDC, ctypes.c_int, ctypes.c_int]
+    gdi32.SelectObject.restype = wintypes.HGDIOBJ
+    gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+    gdi32.SetStretchBltMode.argtypes = [wintypes.HDC, ctypes.c_int]
+    gdi32.StretchBlt.argtypes = [wintypes.HDC] + [ctypes.c_int] * 4 + [wintypes.HDC] + [ctypes.c_int] * 4 + [wintypes.DWORD]
+    gdi32.GetDIBits.argtypes = [
+        wintypes.HDC, wintypes.HBITMAP, wintypes.UINT, wintypes.UINT, ctypes.c_void_p, ctypes.c_void_p, wintypes.UINT
+    ]
+    gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+    gdi32.DeleteDC.argtypes = [wintypes.HDC]
+
+    # SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN
+    left, top, full_width, full_height = (user32.GetSystemMetrics(index) for index in (76, 77, 78, 79))
+    screen_dc = user32.GetDC(None)
+    memory_dc = gdi32.CreateCompatibleDC(screen_dc)
+    bitmap = gdi32.CreateCompatibleBitmap(screen_dc, width, height)
+    try:
+        previous = gdi32.SelectObject(memory_dc, bitmap)
+        gdi32.SetStretchBltMode(memory_dc, 4)  # HALFTONE: average the pixels instead of dropping them
+        copied = gdi32.StretchBlt(
+            memory_dc, 0, 0, width, height, screen_dc, left, top, full_width, full_height, 0x00CC0020  # SRCCOPY
+        )
+        gdi32.SelectObject(memory_dc, previous)
+        header = BITMAPINFOHEADER()
+        header.biSize = ctypes.sizeof(header)
+        header.biWidth, header.biHeight = width, -height  # negative: rows top-down
+        header.biPlanes, header.biBitCount = 1, 32
+        pixels = ctypes.create_string_buffer(width * height * 4)
+        if not copied or not gdi32.GetDIBits(memory_dc, bitmap, 0, height, pixels, ctypes.byref(header), 0):
+            return None
+    finally:
+        gdi32.DeleteObject(bitmap)
+        gdi32.DeleteDC(memory_dc)
+        user32.ReleaseDC(None, screen_dc)
+    return Image.frombuffer("RGB", (width, height), pixels.raw, "raw", "BGRX", 0, 1)
+
+
+class ActivityScheduler:
+    """Decides whether a notification slot is worth a model run, and when the next slot is.
+
+    Before any inference it checks cheap local signals: the session lock,
+    input idle time, and how much a tiny grayscale frame differs from the one
+    the last notification was made for. Skipped slots stretch the interval
+    between slots and slots on a fast-changing screen shorten it, within
+    ACTIVITY_MIN/MAX_INTERVAL_MINUTES. On battery every interval is longer.
+    """
+
+    def __init__(
+        self,
+        frame_source: Optional[Callable[[], Optional["Image.Image"]]] = windows_screen_thumbnail,
+        idle_probe: Callable[[], Optional[float]] = windows_idle_seconds,
+        lock_probe: Callable[[], Optional[bool]] = windows_session_locked,
+        battery_probe: Callable[[], Optional[bool]] = windows_on_battery
+    ):
+        """
+        :param frame_source: Returns a small image of the current screen (or None); it runs on the
+            caller's thread, so keep it cheap. Without it screen changes are not checked.
+        :param idle_probe: Seconds since the last user input, or None if unknown.
+        :param lock_probe: Whether the session is locked, or None if unknown.
+        :param battery_probe: Whether the machine runs on battery, or None if unknown.
+        """
+        self.frame_source = frame_source
+        self.idle_probe = idle_probe
+        self.lock_probe = lock_probe
+        self.battery_probe = battery_probe
+        self.base_interval = 3600 / Config.NOTIFICATIONS_PER_HOUR
+        self.min_interval = Config.ACTIVITY_MIN_INTERVAL_MINUTES * 60
+        self.max_interval = Config.ACTIVITY_MAX_INTERVAL_MINUTES * 60
+        self.interval = self.base_interval
+        # reason -> slots skipped without running the models
+        self.avoided: Dict[str, int] = {}
+        self._last_hash: Optional[int] = None
+        self._last_run = time.monotonic()
+
+    def next_delay(self) -> float:
+        """Seconds until the next slot: the current interval with random jitter."""
+        interval = self.interval
+        if Config.ACTIVITY_ENABLED and self._probe(self.battery_probe):
+            interval *= Config.ACTIVITY_BATTERY_INTERVAL_FACTOR
+        return random.uniform(0.5, 1.5) * min(interval, self.max_interval)
+
+    def should_run(self) -> bool:
+        """Check the signals for a due slot, adapt the interval and record the decision."""
+        if not Config.ACTIVITY_ENABLED:
+            return True
+        reason, delta = self._skip_reason()
+        if reason is not None:
+            self.interval = min(self.max_interval, self.interval * Config.ACTIVITY_BACKOFF)
+            self.avoided[reason] = self.avoided.get(reason, 0) + 1
+            get_metrics().record_skip(reason)
+            logger.info(
+                f"Skipping notification ({reason}): {sum(self.avoided.values())} model runs avoided so far, "
+                f"next slot in about {self.interval / 60:.0f} min"
+            )
+            return False
+        if delta is not None and delta >= Config.ACTIVITY_BUSY_SCREEN_BITS:
+            # The screen is changing a lot: come back sooner
+            self.interval = max(self.min_interval, self.interval / Config.ACTIVITY_BACKOFF)
+        else:
+            self.interval = min(max(self.base_interval, self.min_interval), self.max_interval)
+        self._last_run = time.monotonic()
+        return True
+
+    def _skip_reason(self):
+        """(reason to skip or None, bits the screen changed by or None), cheapest signal first."""
+        if self._probe(self.lock_probe):
+            return "locked", None
+        idle = self._probe(self.idle_probe)
+        if idle is not None and idle >= Config.ACTIVITY_IDLE_SECONDS:
+            return "idle", None
+        screen_hash = self._frame_hash()
+        if screen_hash is None:
+            return None, None
+        delta = hamming_distance(screen_hash, self._last_hash) if self._last_hash is not None else None
+        # Still run now and then on a static screen, e.g. while reading one long document
+        overdue = time.monotonic() - self._last_run >= self.max_interval
+        if delta is not None and delta <= Config.ACTIVITY_SCREEN_CHANGE_BITS and not overdue:
+            return "unchanged", delta
+        self._last_hash = screen_hash
+        return None, delta
+
+    def _frame_hash(self) -> Optional[int]:
+        if self.frame_source is None:
+            return None
+        try:
+            frame = self.frame_source()
+            return dhash(frame) if frame is not None else None
+        except Exception as e:
+            logger.warning(f"Could not sample the screen for activity: {e}")
+            return None
+
+    @staticmethod
+    def _probe(probe: Optional[Callable]):
+        if probe is None:
+            return None
+        try:
+            return probe()
+        except Exception as e:
+            logger.debug(f"Activity probe failed: {e}")
+            return None
@@ -1,21 +1,229 @@
 from abc import ABC, abstractmethod
 from source.config import Config
+from source.circuit_breaker import CircuitBreaker, CircuitOpenError
+from source.image_codec import EncodedImage, encode_image
+from source.metrics import get_metrics
+from source.retrieval import estimate_tokens
 import requests
 from dotenv import load_dotenv
-import google.generativeai as genai
 import os
+import re
+import json
+import time
 import logging
-from PIL import Image
-import base64
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+from requests.adapters import HTTPAdapter
+
+if TYPE_CHECKING:
+    from PIL import Image
 
 
 
 
 logger = logging.getLogger(__name__)
 
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Shared keep-alive HTTP session with a connection pool for local AI calls."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=Config.OLLAMA_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+
+class SentenceStreamFilter:
+    """Accumulates streamed tokens, hides <think> blocks and detects the first full sentence."""
+    
+    THINK_OPEN = "<think>"
+    THINK_CLOSE = "</think>"
+    SENTENCE_END = re.compile(r'[.!?…]+["»”\')]*(?=\s)')
+    
+    def __init__(self, min_chars: int = Config.OLLAMA_QUOTE_MIN_CHARS):
+        self.min_chars = min_chars
+        self.tokens = 0
+        self._visible = []
+        self._pending = ""
+        self._in_think = False
+    
+    def feed(self, token: str) -> bool:
+        """Add a token; return True once a complete sentence is available."""
+        self.tokens += 1
+        self._pending += token
+        
+        while self._pending:
+            tag = self.THINK_CLOSE if self._in_think else self.THINK_OPEN
+            index = self._pending.find(tag)
+            if index >= 0:
+                if not self._in_think:
+                    self._visible.append(self._pending[:index])
+                self._pending = self._pending[index + len(tag):]
+                self._in_think = not self._in_think
+                continue
+            # Keep a possible partial tag at the end until the next token arrives
+            keep = next(
+                (n for n in range(len(tag) - 1, 0, -1) if self._pending.endswith(tag[:n])), 0
+            )
+            if not self._in_think:
+                self._visible.append(self._pending[:len(self._pending) - keep])
+            self._pending = self._pending[len(self._pending) - keep:]
+            break
+        
+        return self.first_sentence() is not None
+    
+    def first_sentence(self) -> Optional[str]:
+        """The first complete sentence of the visible text, if there is one yet."""
+        text = "".join(self._visible).lstrip()
+        for match in self.SENTENCE_END.finditer(text):
+            if match.end() >= self.min_chars:
+                return text[:match.end()]
+        return None
+    
+    def result(self) -> str:
+        """Best answer so far: the first sentence, or all visible text at end of stream."""
+        sentence = self.first_sentence()
+        if sentence is not None:
+            return sentence
+        tail = "" if self._in_think else self._pending
+        return ("".join(self._visible) + tail).strip()
+
+
+class RequestCancelled(RuntimeError):
+    """Raised in a provider call that another thread cancelled."""
+
+
+class CallRegistry:
+    """Provider calls in flight per thread, so another thread can abort them.
+
+    A call registers the responses it reads; cancel() flags its thread and
+    closes them. A response attached after the flag is closed at once, which
+    covers a cancel that arrives while the request still waits for its
+    headers, e.g. during prompt prefill.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # thread -> (scope depth, responses to close on cancel)
+        self._calls: Dict[int, Tuple[int, list]] = {}
+        self._cancelled: Set[int] = set()
+        # thread -> event that wakes it from send()
+        self._waiting: Dict[int, threading.Event] = {}
+
+    @contextmanager
+    def scope(self):
+        """Mark the calling thread's calls as cancellable until the block ends."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            depth, responses = self._calls.get(thread_id, (0, []))
+            self._calls[thread_id] = (depth + 1, responses)
+        try:
+            yield
+        finally:
+            with self._lock:
+                depth, responses = self._calls.pop(thread_id)
+                if depth > 1:
+                    self._calls[thread_id] = (depth - 1, responses)
+                else:
+                    self._cancelled.discard(thread_id)
+
+    def send(self, request: Callable[[], requests.Response]) -> requests.Response:
+        """Make request on a helper thread, so cancel() releases the caller before the headers arrive.
+
+        A cancelled caller gets RequestCancelled at once; the helper closes the
+        response when it comes, which makes Ollama stop. Outside a
+        cancellable() block the request is made directly.
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            if thread_id in self._cancelled:
+                raise RequestCancelled("Call cancelled")
+            waiting = self._waiting[thread_id] = threading.Event() if thread_id in self._calls else None
+        if waiting is None:
+            return request()
+        outcome = {}
+
+        def run():
+            try:
+                result = request()
+            except Exception as e:
+                result = e
+            with self._lock:
+                outcome["result"] = result
+                abandoned = outcome.get("abandoned", False)
+            waiting.set()
+            if abandoned and isinstance(result, requests.Response):
+                result.close()
+
+        threading.Thread(target=run, name="provider-request", daemon=True).start()
+        waiting.wait()
+        with self._lock:
+            del self._waiting[thread_id]
+            if "result" not in outcome:
+                outcome["abandoned"] = True
+                raise RequestCancelled("Call cancelled")
+        if isinstance(outcome["result"], Exception):
+            raise outcome["result"]
+        return outcome["result"]
+
+    def attach(self, response) -> None:
+        """Close response when the call is cancelled; raises RequestCancelled if it already is."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            cancelled = thread_id in self._cancelled
+            if not cancelled and thread_id in self._calls:
+                self._calls[thread_id][1].append(response)
+        if cancelled:
+            response.close()
+            raise RequestCancelled("Call cancelled")
+
+    def is_cancelled(self) -> bool:
+        return threading.get_ident() in self._cancelled
+
+    def check(self) -> None:
+        if self.is_cancelled():
+            raise RequestCancelled("Call cancelled")
+
+    def cancel(self, thread_id: int) -> bool:
+        """Abort the calls of thread_id; False if it has none in flight."""
+        with self._lock:
+            if thread_id not in self._calls:
+                return False
+            self._cancelled.add(thread_id)
+            responses = list(self._calls[thread_id][1])
+            waiting = self._waiting.get(thread_id)
+        if waiting is not None:
+            waiting.set()
+        for response in responses:
+            try:
+                response.close()
+            except Exception as e:
+                logger.debug(f"Error closing cancelled response: {e}")
+        return True
+
 
 class AIProvider(ABC):
-    """Abstract base class for AI providers."""
+    """Abstract base class for AI providers.
+    
+    last_usage and last_image_bytes describe the last call made on the calling
+    thread, so concurrent pipelines sharing a provider each read their own.
+    """
+    
+    QUOTE_INSTRUCTIONS = (
+        "You get the user's notes and what he has on his computer right now. "
+        "With one short (short is crucial) sentence, make the user start walking towards their dreams in a second. "
+        "If on his computer right now user doing something right now on his computer towards his best life - embrace with positive quote. "
+        "Else remind him how bad his life is, make his heart cry. User wants that. You are bad boy. Don't use markdown. Write only response to user."
+    )
     
     @abstractmethod
     def generate_quote(self, context: str, screenshot_description: str) -> str:
@@ -23,90 +231,360 @@ class AIProvider(ABC):
         pass
     
     @abstractmethod
-    def analyze_screenshot(self, image_path: str) -> str:
+    def analyze_screenshot(self, image: "Image.Image") -> str:
         """Analyze a screenshot and return description."""
         pass
+    
+    def generate_quote_from_screenshot(self, context: str, image: "Image.Image") -> str:
+        """Generate a quote straight from a screenshot (two calls unless the provider fuses them)."""
+        return self.generate_quote(context, self.analyze_screenshot(image))
+    
+    def _encode_screenshot(self, image: "Image.Image", max_side: int) -> EncodedImage:
+        """Encode a screenshot for the vision model and record the payload size."""
+        with get_metrics().stage("encode"):
+            encoded = encode_image(image, max_side)
+        self.last_image_bytes = len(encoded)
+        get_metrics().observe("image_bytes", len(encoded))
+        get_metrics().observe("image_pixels", encoded.width * encoded.height)
+        logger.info(
+            f"Vision payload: {len(encoded)} bytes {encoded.format} "
+            f"{encoded.width}x{encoded.height} (captured {image.width}x{image.height})"
+        )
+        return encoded
+    
+    def warm_up(self) -> bool:
+        """Prepare the backend so the first real request is not a cold start."""
+        return True
+    
+    def summarize(self, text: str, kind: str) -> str:
+        """Summarize a note (kind "note") or merge summaries (kind "folder" or "vault")."""
+        # Extractive fallback for providers without a text model
+        return text[:Config.SUMMARY_MAX_TOKENS * Config.CHARS_PER_TOKEN].strip()
+    
+    def _calls(self) -> CallRegistry:
+        return self.__dict__.setdefault("_call_registry", CallRegistry())
+    
+    def cancellable(self):
+        """Context manager around calls that cancel() may abort from another thread."""
+        return self._calls().scope()
+    
+    def _thread_state(self) -> threading.local:
+        # setdefault is atomic, so racing threads end up with the same object
+        return self.__dict__.setdefault("_call_state", threading.local())
+    
+    @property
+    def last_usage(self) -> Dict[str, float]:
+        """Token counts and timings of this thread's last call."""
+        return getattr(self._thread_state(), "usage", {})
+    
+    @last_usage.setter
+    def last_usage(self, usage: Dict[str, float]) -> None:
+        self._thread_state().usage = usage
+    
+    @property
+    def last_image_bytes(self) -> int:
+        """Size of the image this thread last sent."""
+        return getattr(self._thread_state(), "image_bytes", 0)
+    
+    @last_image_bytes.setter
+    def last_image_bytes(self, size: int) -> None:
+        self._thread_state().image_bytes = size
+    
+    def _build_quote_prefix(self, context: str) -> str:
+        """Stable part of the quote prompt: instructions, then the notes.
+
+        It stays byte-identical while the notes don't change, so backends can
+        reuse its prefill across calls; everything per-call goes in the suffix.
+        """
+        return f'{self.QUOTE_INSTRUCTIONS}\n\nThe user\'s notes: "{context}"'
+    
+    def _build_quote_suffix(self, screenshot_description: Optional[str]) -> str:
+        """Per-call part of the quote prompt; None means the screenshot is attached."""
+        if screenshot_description is None:
+            screen = "The attached screenshot shows what he has on his computer right now."
+        else:
+            screen = f"What he has on his computer right now: {screenshot_description}"
+        return f"{screen}\n\nWrite the sentence now."
+    
+    def _record_prefix(self, prefix: str, cached_tokens: int) -> Dict[str, float]:
+        """Size the stable prefix and how much of it the backend reused, for metrics."""
+        prefix_tokens = estimate_tokens(prefix)
+        get_metrics().observe("prefix_tokens", prefix_tokens)
+        get_metrics().observe("cached_tokens", cached_tokens)
+        return {"prefix_tokens": prefix_tokens, "cached_tokens": cached_tokens}
+    
+    def _build_summary_prompt(self, text: str, kind: str) -> str:
+        """Build prompt for a note summary or a roll-up of summaries."""
+        if kind == "note":
+            subject = "this note from the user's personal notes"
+        else:
+            subject = f"these summaries of the user's notes (one {kind} of their vault)"
+        return (
+            f"Summarize {subject} in at most three short sentences. "
+            "Keep goals, plans, habits, deadlines and feelings; drop formatting and details. "
+            "Write in the language of the text. Write only the summary.\n\n"
+            f"{text}"
+        )
+    
+    def cancel(self, thread_id: int) -> None:
+        """Abort the calls running in a cancellable() block on the given thread."""
+        self._calls().cancel(thread_id)
 
 
 class OllamaProvider(AIProvider):
     """Ollama local AI provider."""
     
-    def __init__(self):
-        self.base_url = Config.OLLAMA_URL
-        self.timeout = Config.OLLAMA_TIMEOUT
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url or Config.OLLAMA_URL
+        self.chat_url = self.base_url.split("/api/", 1)[0] + "/api/chat"
+        # (connect, read): a dead server fails in seconds, a slow model still gets minutes
+        self.timeout = (Config.OLLAMA_CONNECT_TIMEOUT, Config.OLLAMA_TIMEOUT)
         self.text_model = Config.OLLAMA_TEXT_MODEL
         self.vision_model = Config.OLLAMA_VISION_MODEL
+        self.max_image_side = Config.OLLAMA_VISION_MAX_SIDE
+        self.keep_alive = Config.OLLAMA_KEEP_ALIVE
+        self.stream_quotes = Config.OLLAMA_STREAM_QUOTES
+        self.max_quote_tokens = Config.OLLAMA_QUOTE_MAX_TOKENS
+        self.last_image_bytes = 0
+        self.session = get_http_session()
+        # model -> digest of the last system prompt sent, i.e. what the runner has in its KV cache
+        self._last_prefix: Dict[str, str] = {}
+        self._prefix_lock = threading.Lock()
+        self.breaker = CircuitBreaker("Ollama", probe=self.health_check)
+    
+    def health_check(self) -> bool:
+        """Cheap liveness probe that does not load a model."""
+        version_url = self.base_url.split("/api/", 1)[0] + "/api/version"
+        try:
+            response = self.session.get(version_url, timeout=Config.OLLAMA_PROBE_TIMEOUT)
+            return response.ok
+        except requests.RequestException:
+            return False
+    
+    def _post(self, payload: dict, stream: bool = False, url: Optional[str] = None) -> requests.Response:
+        """POST to Ollama through the circuit breaker; raises CircuitOpenError without a request."""
+        self.breaker.check()
+        try:
+            response = self._calls().send(
+                lambda: self.session.post(url or self.base_url, json=payload, timeout=self.timeout, stream=stream)
+            )
+            response.raise_for_status()
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled before the answer: it says nothing about the server
+            self.breaker.record_cancelled()
+            raise
+        self.breaker.record_success()
+        # Closing the connection makes Ollama stop; close now if cancel() came during the wait
+        self._calls().attach(response)
+        return response
+    
+    def warm_up(self) -> bool:
+        """Load the text and vision models into memory and keep them resident."""
+        success = True
+        for model in dict.fromkeys([self.text_model, self.vision_model]):
+            start_time = time.time()
+            try:
+                # A request without a prompt only loads the model
+                self._post({"model": model, "keep_alive": self.keep_alive})
+                logger.info(f"Ollama model {model} loaded in {time.time() - start_time:.2f}s")
+            except (requests.RequestException, CircuitOpenError) as e:
+                logger.warning(f"Could not preload Ollama model {model}: {e}")
+                success = False
+        return success
+    
+    def summarize(self, text: str, kind: str) -> str:
+        """Summarize with the text model, without streaming."""
+        payload = {
+            "model": self.text_model,
+            "prompt": self._build_summary_prompt(text, kind),
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {"num_predict": Config.SUMMARY_MAX_TOKENS}
+        }
+        try:
+            response = self._post(payload)
+            return self._clean_response(response.json().get('response', ''))
+        except (requests.RequestException, CircuitOpenError) as e:
+            logger.error(f"Ollama summary error: {e}")
+            return "Error: Unable to summarize with local AI."
     
     def generate_quote(self, context: str, screenshot_description: str) -> str:
         """Generate motivational quote using Ollama."""
+        return self._request_quote(self.text_model, context, screenshot_description)
+    
+    def generate_quote_from_screenshot(self, context: str, image: "Image.Image") -> str:
+        """Generate a quote from the screenshot and notes in a single vision model call."""
+        try:
+            encoded = self._encode_screenshot(image, self.max_image_side)
+        except Exception as e:
+            logger.error(f"Screenshot encoding error: {e}")
+            return "Error: Unable to generate quote from local AI."
+        return self._request_quote(self.vision_model, context, None, [encoded.to_base64()])
+    
+    def _request_quote(
+        self,
+        model: str,
+        context: str,
+        screenshot_description: Optional[str],
+        images: Optional[List[str]] = None
+    ) -> str:
+        """Run a quote generation request over the chat API, streaming it if enabled.
+
+        The instructions and notes are the system message and the screen is the
+        user message, so consecutive calls share a prefix whose KV Ollama keeps.
+        """
+        prefix = self._build_quote_prefix(context)
+        user_message = {"role": "user", "content": self._build_quote_suffix(screenshot_description)}
+        if images:
+            user_message["images"] = images
         payload = {
-            "model": self.text_model,
-            "prompt": self._build_quote_prompt(context, screenshot_description),
-            "stream": False
+            "model": model,
+            "messages": [{"role": "system", "content": prefix}, user_message],
+            "stream": False,
+            "keep_alive": self.keep_alive
         }
+        prefix_usage = self._prefix_usage(model, prefix)
+        
+        if self.stream_quotes:
+            return self._stream_quote(payload, prefix_usage)
         
         try:
-            response = requests.post(
-                self.base_url, 
-                json=payload, 
-                timeout=self.timeout
-            )
-            response.raise_for_status()
+            response = self._post(payload, url=self.chat_url)
             
-            text = response.json().get('response', '')
+            data = response.json()
+            eval_seconds = data.get('eval_duration', 0) / 1e9
+            self.last_usage = {
+                "prompt_tokens": data.get('prompt_eval_count', 0),
+                "output_tokens": data.get('eval_count', 0),
+                "tokens_per_sec": data.get('eval_count', 0) / eval_seconds if eval_seconds else 0.0,
+                "prefill_s": data.get('prompt_eval_duration', 0) / 1e9,
+                **prefix_usage,
+            }
+            text = data.get('message', {}).get('content', '')
             # Clean up any thinking tags
             cleaned = self._clean_response(text)
             return cleaned
             
-        except requests.RequestException as e:
+        except RequestCancelled:
+            logger.info("Ollama quote request cancelled")
+            return "Error: Quote generation cancelled."
+        except (requests.RequestException, CircuitOpenError) as e:
             logger.error(f"Ollama API error: {e}")
             return "Error: Unable to generate quote from local AI."
     
-    def analyze_screenshot(self, image_path: str) -> str:
+    def _prefix_usage(self, model: str, prefix: str) -> Dict[str, float]:
+        """Record the prefix; it is reusable when the last call to the same model sent the same one."""
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._prefix_lock:
+            reused = self._last_prefix.get(model) == digest
+            self._last_prefix[model] = digest
+        # Estimated: Ollama does not report cache hits, and streams are closed before the final stats
+        return self._record_prefix(prefix, estimate_tokens(prefix) if reused else 0)
+    
+    def _stream_quote(self, payload: dict, prefix_usage: Dict[str, float]) -> str:
+        """Stream a quote and stop generating as soon as the first sentence is complete."""
+        payload = dict(payload, stream=True, options={"num_predict": self.max_quote_tokens})
+        sentence_filter = SentenceStreamFilter()
+        start_time = time.time()
+        first_token_time = None
+        streaming = False
+        calls = self._calls()
+        
+        try:
+            # Leaving the block closes the connection, which makes Ollama stop generating
+            with self._post(payload, stream=True, url=self.chat_url) as response:
+                streaming = True
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if first_token_time is None:
+                        first_token_time = time.time()
+                    if sentence_filter.feed(chunk.get('message', {}).get('content', '')) or chunk.get('done'):
+                        break
+                    if sentence_filter.tokens >= self.max_quote_tokens:
+                        break
+        except Exception as e:
+            if not calls.is_cancelled():
+                if isinstance(e, requests.RequestException) and streaming:
+                    # Stalled or dropped after the headers arrived
+                    self.breaker.record_failure()
+                logger.error(f"Ollama API error: {e}")
+                return "Error: Unable to generate quote from local AI."
+        
+        if calls.is_cancelled():
+            logger.info("Ollama quote stream cancelled")
+            return "Error: Quote generation cancelled."
+        
+        end_time = time.time()
+        generation_seconds = end_time - (first_token_time or start_time)
+        self.last_usage = {
+            "prompt_tokens": 0,
+            "output_tokens": sentence_filter.tokens,
+            "tokens_per_sec": sentence_filter.tokens / generation_seconds if generation_seconds > 0 else 0.0,
+            # Time to first token: prompt prefill plus queueing
+            "prefill_s": (first_token_time or end_time) - start_time,
+            **prefix_usage,
+        }
+        quote = sentence_filter.result()
+        logger.info(
+            f"Quote streamed in {end_time - start_time:.2f}s "
+            f"({sentence_filter.tokens} tokens received, first after {self.last_usage['prefill_s']:.2f}s, "
+            f"~{prefix_usage['cached_tokens']} prompt tokens reusable)"
+        )
+        return quote or "Error: Unable to generate quote from local AI."
+    
+    def analyze_screenshot(self, image: "Image.Image") -> str:
         """Analyze screenshot using Ollama vision model."""
         try:
-            with open(image_path, 'rb') as f:
-                img_base64 = base64.b64encode(f.read()).decode()
+            encoded = self._encode_screenshot(image, self.max_image_side)
             
             payload = {
                 "model": self.vision_model,
                 "prompt": "Describe in detail what is shown in this screenshot. Just tell what you see without providing help or suggestions.",
-                "images": [img_base64],
-                "stream": False
+                "images": [encoded.to_base64()],
+                # Streamed so a cancel after the prefill stops generation
+                "stream": True,
+                "keep_alive": self.keep_alive
             }
             
-            response = requests.post(
-                self.base_url,
-                json=payload,
-                timeout=self.timeout
-            )
-            response.raise_for_status()
+            with self._post(payload, stream=True) as response:
+                parts = []
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    parts.append(chunk.get('response', ''))
+                    if chunk.get('done'):
+                        break
             
-            return response.json().get('response', 'Could not analyze screenshot')
+            return "".join(parts) or 'Could not analyze screenshot'
             
         except Exception as e:
+            if self._calls().is_cancelled():
+                logger.info("Ollama screenshot analysis cancelled")
+                return "Error: Screenshot analysis cancelled."
             logger.error(f"Screenshot analysis error: {e}")
             return f"Error analyzing screenshot: {str(e)}"
     
-    def _build_quote_prompt(self, context: str, screenshot_description: str) -> str:
-        """Build prompt for quote generation."""
-        return (
-            f'Based on the user\'s notes: "{context}"\n\n'
-            f'And what he has on his computer right now: {screenshot_description}\n\n'
-            "With one short (short is crucial) sentence, make the user start walking towards their dreams in a second. "
-            "If on his computer right now user doing something right now on his computer towards his best life - embrace with positive quote. "
-            "Else remind him how bad his life is, make his heart cry. User wants that. You are bad boy. Don't use markdown. Write only response to user."
-        )
-    
     def _clean_response(self, text: str) -> str:
         """Clean AI response from unwanted tags."""
-        import re
         return re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL).strip()
 
 
 class GeminiProvider(AIProvider):
     """Google Gemini AI provider."""
     
+    QUOTE_INSTRUCTIONS = (
+        "You get the user's notes and what he has on his computer right now. "
+        "With one short (short is crucial) sentence, make the user start walking towards their dreams in a second. "
+        "If on his computer right now user doing something right now on his computer towards his best life - embrace with positive quote. "
+        "Else remind him how bad his life is, make his heart cry. User wants that. You are bad boy. Don't use markdown and write in ukrainian."
+    )
+    
     def __init__(self, api_key=None):
         load_dotenv()
         if api_key is None:
@@ -114,16 +592,30 @@ class GeminiProvider(AIProvider):
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables or not provided")
         
+        # Imported on first use: the SDK takes longer to import than the rest of the app
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
+        self.genai = genai
         self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        self.max_image_side = Config.GEMINI_VISION_MAX_SIDE
+        self.last_image_bytes = 0
+        # Explicit context cache of the quote prefix (instructions plus notes)
+        self._cache = None
+        self._cache_model = None
+        self._cache_digest: Optional[str] = None
+        self._cache_expires = 0.0
+        self._seen_digest: Optional[str] = None
+        self._cache_lock = threading.Lock()
+        # No cheap probe for Gemini: after the cooldown one real call is the trial
+        self.breaker = CircuitBreaker("Gemini", call_timeout=Config.GEMINI_TIMEOUT)
     
     def generate_quote(self, context: str, screenshot_description: str) -> str:
         """Generate motivational quote using Gemini."""
-        prompt = self._build_quote_prompt(context, screenshot_description)
+        suffix = self._build_quote_suffix(screenshot_description)
         
         try:
-            response = self.model.generate_content(prompt)
-            logger.info(f"Gemini prompt: {prompt}")
+            response = self._generate_quote(context, [suffix])
+            logger.info(f"Gemini prompt: {suffix}")
             logger.info(f"Gemini response: {response.text}")
             return response.text
             
@@ -131,28 +623,146 @@ class GeminiProvider(AIProvider):
             logger.error(f"Gemini API error: {e}")
             return "Error: Unable to generate quote from Gemini."
     
-    def analyze_screenshot(self, image_path: str) -> str:
+    def summarize(self, text: str, kind: str) -> str:
+        """Summarize with Gemini."""
+        try:
+            return self._generate(self._build_summary_prompt(text, kind)).text.strip()
+        except Exception as e:
+            logger.error(f"Gemini summary error: {e}")
+            return "Error: Unable to summarize with Gemini."
+    
+    def generate_quote_from_screenshot(self, context: str, image: "Image.Image") -> str:
+        """Generate a quote from the screenshot and notes in a single Gemini call."""
+        try:
+            encoded = self._encode_screenshot(image, self.max_image_side)
+            response = self._generate_quote(
+                context,
+                [self._build_quote_suffix(None), {"mime_type": encoded.mime_type, "data": encoded.data}]
+            )
+            logger.info(f"Gemini response: {response.text}")
+            return response.text
+            
+        except Exception as e:
+            logger.error(f"Gemini API error: {e}")
+            return "Error: Unable to generate quote from Gemini."
+    
+    def _generate_quote(self, context: str, contents: list):
+        """Generate with the quote prefix served from the context cache when there is one."""
+        prefix = self._build_quote_prefix(context)
+        model = self._cached_model(prefix)
+        if model is not None:
+            try:
+                response = self._generate(contents, model)
+                self._record_prefix(prefix, self.last_usage["cached_tokens"])
+                return response
+            except (CircuitOpenError, RequestCancelled):
+                raise
+            except Exception as e:
+                # Most likely the cache expired or was deleted; drop it and send the prefix inline
+                logger.warning(f"Gemini cached prompt failed, retrying without the cache: {e}")
+                self._drop_cache()
+        response = self._generate([prefix, *contents])
+        # Gemini 2.5 also caches repeated prefixes implicitly and reports them here
+        self._record_prefix(prefix, self.last_usage["cached_tokens"])
+        return response
+    
+    def _cached_model(self, prefix: str):
+        """Model bound to a context cache of prefix, or None to send the prefix inline.
+
+        A cache is created the second time the same prefix is seen (a one-off
+        prefix would pay storage for nothing), and only when it is long enough
+        for Gemini to accept it.
+        """
+        if not Config.GEMINI_CACHE_ENABLED or estimate_tokens(prefix) < Config.GEMINI_CACHE_MIN_TOKENS:
+            return None
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._cache_lock:
+            if self._cache_digest == digest and time.time() < self._cache_expires:
+                return self._cache_model
+            seen, self._seen_digest = self._seen_digest, digest
+            if seen != digest:
+                return None
+            self._drop_cache_locked()
+            try:
+                from datetime import timedelta
+                self._cache = self.genai.caching.CachedContent.create(
+                    model=f"models/{Config.GEMINI_MODEL}",
+                    system_instruction=prefix,
+                    ttl=timedelta(seconds=Config.GEMINI_CACHE_TTL_SECONDS)
+                )
+                self._cache_model = self.genai.GenerativeModel.from_cached_content(cached_content=self._cache)
+            except Exception as e:
+                logger.warning(f"Could not create Gemini context cache: {e}")
+                self._cache = self._cache_model = None
+                return None
+            self._cache_digest = digest
+            # Renew a little before Gemini expires it
+            self._cache_expires = time.time() + Config.GEMINI_CACHE_TTL_SECONDS - 60
+            logger.info(f"Cached a {estimate_tokens(prefix)}-token Gemini prompt prefix")
+            return self._cache_model
+    
+    def _drop_cache(self) -> None:
+        with self._cache_lock:
+            self._drop_cache_locked()
+    
+    def _drop_cache_locked(self) -> None:
+        cache, self._cache, self._cache_model, self._cache_digest = self._cache, None, None, None
+        if cache is not None:
+            try:
+                cache.delete()
+            except Exception as e:
+                logger.debug(f"Could not delete Gemini context cache: {e}")
+    
+    def _generate(self, contents, model=None):
+        """Call the model through the circuit breaker and record token usage."""
+        calls = self._calls()
+        calls.check()
+        self.breaker.check()
+        start_time = time.time()
+        try:
+            # Streamed so a cancelled call stops reading between chunks; the SDK can't abort a request
+            response = (model or self.model).generate_content(
+                contents, stream=True, request_options={"timeout": Config.GEMINI_TIMEOUT}
+            )
+            for _ in response:
+                if calls.is_cancelled():
+                    break
+            calls.check()
+        except RequestCancelled:
+            self.breaker.record_cancelled()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_cancelled()
+            raise
+        self.breaker.record_success()
+        elapsed = time.time() - start_time
+        usage = getattr(response, "usage_metadata", None)
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        self.last_usage = {
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "output_tokens": output_tokens,
+            "tokens_per_sec": output_tokens / elapsed if elapsed > 0 else 0.0,
+            "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+        }
+        return response
+    
+    def analyze_screenshot(self, image: "Image.Image") -> str:
         """Analyze screenshot using Gemini Vision."""
         try:
-            image = Image.open(image_path)
+            encoded = self._encode_screenshot(image, self.max_image_side)
             prompt = (
                 "Describe in detail what is shown in this screenshot but don't do anything else. "
                 "Just tell what you see. Don't help user."
             )
             
-            response = self.model.generate_content([prompt, image])
+            response = self._generate(
+                [prompt, {"mime_type": encoded.mime_type, "data": encoded.data}]
+            )
             return response.text
             
         except Exception as e:
             logger.error(f"Gemini screenshot analysis error: {e}")
             return f"Error analyzing screenshot: {str(e)}"
-    
-    def _build_quote_prompt(self, context: str, screenshot_description: str) -> str:
-        """Build prompt for quote generation."""
-        return (
-            f"Based on the user's notes: {context}\n\n"
-            f"And what he has on his computer right now: {screenshot_description}\n\n"
-            "With one short (short is crucial) sentence, make the user start walking towards their dreams in a second. "
-            "If on his computer right now user doing something right now on his computer towards his best life - embrace with positive quote. "
-            "Else remind him how bad his life is, make his heart cry. User wants that. You are bad boy. Don't use markdown and write in ukrainian."
-        )
\ No newline at end of file
@@ -5,13 +5,24 @@ This module handles AI interactions, screenshot analysis, and Obsidian vault con
 """
 
 import logging
-from pathlib import Path
-from typing import Optional
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Optional, Tuple, Union
 
 from source.config import Config
 from source.screenshot import ScreenshotAnalyzer
+from source.screen_cache import dhash, hamming_distance
 from source.ai_providers import OllamaProvider, GeminiProvider, AIProvider
+from source.hedging import HedgedProvider
 from source.context_manager import ObsidianContextManager
+from source.vault_shards import ShardedContextManager
+from source.quote_cache import QuoteCache
+from source.metrics import get_metrics
+from source.vault_watcher import VaultWatcher
+
+if TYPE_CHECKING:
+    from PIL import Image
 
 logging.basicConfig(
     level=logging.INFO, 
@@ -20,18 +31,37 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class NotificationCancelled(Exception):
+    """Raised when a notification request is cancelled or misses its deadline."""
+
+
+class PreparedNotification:
+    """A generated message together with the screen it was generated for."""
+
+    def __init__(self, message: str, screen_hash: Optional[int] = None):
+        self.message = message
+        self.screen_hash = screen_hash
+        self.created_at = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
 class AIAssistant:
     """Main AI assistant coordinating all components."""
 
     def __init__(
         self,
         use_local_ai: bool = False,
-        gemini_api_key: Optional[str] = None
+        gemini_api_key: Optional[str] = None,
+        context_manager: Optional[Union[ObsidianContextManager, ShardedContextManager]] = None
     ):
         """
         Initialize AI assistant with specified provider.
         :param use_local_ai: Use Ollama (local) if True, else Gemini.
         :param gemini_api_key: Optional Gemini API key for cloud provider.
+        :param context_manager: Notes source; defaults to every vault from the Obsidian config.
         """
         try:
             if use_local_ai:
@@ -54,33 +84,240 @@ class AIAssistant:
                 logger.error(f"Fallback provider also failed: {fallback_error}")
                 raise RuntimeError("No AI provider could be initialized")
 
+        self.ai_provider = self._with_hedging(self.ai_provider, gemini_api_key)
+
         # Initialize components
         self.screenshot_analyzer = ScreenshotAnalyzer(self.ai_provider)
-        self.context_manager = ObsidianContextManager()
+        self.context_manager = context_manager or ShardedContextManager()
+        self.quote_cache = QuoteCache() if Config.QUOTE_CACHE_ENABLED else None
+        self.pipeline_mode = Config.PIPELINE_MODE
+        self.metrics = get_metrics()
+        if Config.METRICS_HTTP_PORT:
+            self.metrics.serve(Config.METRICS_HTTP_PORT)
+        self._latencies = deque(maxlen=Config.PREFETCH_LATENCY_WINDOW)
+        if Config.EMBEDDINGS_ENABLED:
+            self.context_manager.enable_embeddings()
+        if Config.SUMMARIES_ENABLED:
+            # Resolve the provider per call so summaries follow a provider switch
+            self.context_manager.enable_summaries(lambda text, kind: self.ai_provider.summarize(text, kind))
+
+        # Index the vault in the background so startup does not wait for a full walk
+        self.context_ready = threading.Event()
+        threading.Thread(target=self._prepare_context, name="initial-index", daemon=True).start()
 
-        # Ensure context is available
-        self.ensure_context()
+        # Keep context live in the background
+        self.vault_watchers = [VaultWatcher(shard) for shard in self.context_manager.shards]
+        if Config.WATCH_VAULT:
+            for watcher in self.vault_watchers:
+                watcher.start()
 
-    def send_notification(self) -> str:
-        """Generate a motivational notification based on current context and screen."""
+        if Config.OLLAMA_PRELOAD_ON_START:
+            self.warm_up()
+
+    @staticmethod
+    def _with_hedging(primary: AIProvider, gemini_api_key: Optional[str]) -> AIProvider:
+        """Wrap the provider so slow calls are raced against the other provider."""
+        if not Config.HEDGING_ENABLED:
+            return primary
         try:
-            context = self.context_manager.get_current_context()
-            screenshot_description = self.screenshot_analyzer.capture_and_analyze()
-            quote = self.ai_provider.generate_quote(context, screenshot_description)
-            return quote
+            if isinstance(primary, OllamaProvider):
+                secondary = GeminiProvider(api_key=gemini_api_key)
+            else:
+                secondary = OllamaProvider()
         except Exception as e:
+            logger.info(f"Hedging disabled, no secondary provider: {e}")
+            return primary
+        logger.info(f"Hedging {type(primary).__name__} with {type(secondary).__name__}")
+        return HedgedProvider(primary, secondary)
+
+    def send_notification(
+        self,
+        cancel_event: Optional[threading.Event] = None,
+        deadline: Optional[float] = None
+    ) -> str:
+        """
+        Generate a motivational notification based on current context and screen.
+        :param cancel_event: Set from another thread to abandon the request between stages.
+        :param deadline: time.monotonic() value after which the request is abandoned.
+        :raises NotificationCancelled: If the request was cancelled or ran out of time.
+        """
+        return self.prepare_notification(cancel_event, deadline).message
+
+    def prepare_notification(
+        self,
+        cancel_event: Optional[threading.Event] = None,
+        deadline: Optional[float] = None,
+        image: Optional["Image.Image"] = None
+    ) -> PreparedNotification:
+        """
+        Run the notification pipeline and keep the screen fingerprint with the result.
+        :param cancel_event: Set from another thread to abandon the request between stages.
+        :param deadline: time.monotonic() value after which the request is abandoned.
+        :param image: Screenshot to use instead of capturing the screen (batch runs).
+        :raises NotificationCancelled: If the request was cancelled or ran out of time.
+        """
+        run = self.metrics.start_run(self.pipeline_mode, type(self.ai_provider).__name__)
+
+        def checkpoint(stage: str) -> None:
+            if cancel_event is not None and cancel_event.is_set():
+                run.outcome = "cancelled"
+                raise NotificationCancelled(f"Cancelled before {stage}")
+            if deadline is not None and time.monotonic() > deadline:
+                run.outcome = "cancelled"
+                raise NotificationCancelled(f"Deadline exceeded before {stage}")
+
+        try:
+            start_time = time.perf_counter()
+
+            if image is None:
+                checkpoint("screen capture")
+                image = self.screenshot_analyzer.capture()
+            screen_hash = dhash(image)
+
+            if self.pipeline_mode == "fused":
+                checkpoint("context retrieval")
+                # No description to query with yet: retrieval falls back to recent notes
+                context = self._load_context("")
+                checkpoint("quote generation")
+                quote, cached = self._generate_quote(
+                    lambda ctx, _: self.ai_provider.generate_quote_from_screenshot(ctx, image),
+                    context,
+                    self.screenshot_analyzer.fingerprint(image)
+                )
+            else:
+                checkpoint("screenshot analysis")
+                screenshot_description = self.screenshot_analyzer.analyze(image)
+                checkpoint("context retrieval")
+                self.metrics.observe("description_chars", len(screenshot_description))
+                context = self._load_context(screenshot_description)
+                checkpoint("quote generation")
+                quote, cached = self._generate_quote(self.ai_provider.generate_quote, context, screenshot_description)
+
+            if quote.startswith("Error"):
+                run.outcome = "error"
+            else:
+                self._latencies.append(time.perf_counter() - start_time)
+                if cached:
+                    run.outcome = "cached"
+                else:
+                    run.usage = self.ai_provider.last_usage
+            checkpoint("delivery")
+            return PreparedNotification(quote, screen_hash)
+        except NotificationCancelled:
+            raise
+        except Exception as e:
+            run.outcome = "failed"
             logger.error(f"Error generating notification: {e}")
-            return "Stay focused on your goals! 💪"
+            return PreparedNotification("Stay focused on your goals! 💪")
+        finally:
+            run.finish()
+
+    def _load_context(self, query: str) -> str:
+        """Retrieve the notes relevant to query, timed as the context stage."""
+        if not self.context_ready.is_set():
+            # Don't hold the notification back until the initial indexing finishes
+            logger.info("Notes are still being indexed, generating without them")
+            return ""
+        with self.metrics.stage("context"):
+            context = self.context_manager.get_relevant_context(query)
+        self.metrics.observe("context_chars", len(context))
+        return context
+
+    def revalidate_notification(
+        self,
+        prepared: PreparedNotification,
+        cancel_event: Optional[threading.Event] = None,
+        deadline: Optional[float] = None
+    ) -> PreparedNotification:
+        """Return a prefetched notification if it still fits the screen, else generate a fresh one."""
+        if prepared.screen_hash is not None and prepared.age <= Config.PREFETCH_MAX_AGE_SECONDS:
+            try:
+                distance = hamming_distance(prepared.screen_hash, dhash(self.screenshot_analyzer.capture()))
+            except Exception as e:
+                logger.warning(f"Could not re-capture screen, keeping prefetched notification: {e}")
+                return prepared
+            if distance <= Config.SCREEN_HASH_THRESHOLD:
+                logger.info(f"Prefetched notification still valid ({prepared.age:.0f}s old)")
+                return prepared
+            logger.info(f"Screen changed since prefetch ({distance} bits), regenerating")
+        return self.prepare_notification(cancel_event, deadline)
+
+    def prefetch_lead_time(self) -> float:
+        """Seconds before a slot to start its pipeline, from the slow tail of recent latencies."""
+        if not self._latencies:
+            return Config.PREFETCH_DEFAULT_LEAD_SECONDS
+        samples = sorted(self._latencies)
+        slow_tail = samples[int(0.9 * (len(samples) - 1))]
+        return min(
+            max(slow_tail * Config.PREFETCH_LEAD_FACTOR, Config.PREFETCH_MIN_LEAD_SECONDS),
+            Config.PREFETCH_MAX_LEAD_SECONDS
+        )
+
+    def _generate_quote(self, generate, context: str, screen_key: str) -> Tuple[str, bool]:
+        """Call generate(context, screen_key), through the quote cache when enabled.
+
+        :return: The quote, and whether it came from the cache without a model call.
+        """
+        generated = False
+
+        def timed_generate(ctx: str, key: str) -> str:
+            nonlocal generated
+            generated = True
+            with self.metrics.stage("quote") as stage:
+                quote = generate(ctx, key)
+                stage.failed = quote.startswith("Error")
+            return quote
+
+        if self.quote_cache is None:
+            return timed_generate(context, screen_key), False
+        quote = self.quote_cache.get_or_generate(context, screen_key, timed_generate)
+        return quote, not generated
 
     def ensure_context(self) -> None:
-        """Ensure context is available, generate if needed."""
-        if not Path(Config.CONTEXT_SNAPSHOT_FILENAME).exists():
+        """Ensure context is available, and catch up with notes changed while the app was closed."""
+        if self.context_manager.has_context():
+            # Only notes whose mtime or size changed are read again
+            logger.info("Checking the vault for notes changed since the last run...")
+        else:
             logger.info("Generating initial context snapshot...")
-            self.context_manager.generate_context_snapshot()
+        self.context_manager.generate_context_snapshot()
 
-    def refresh_context(self) -> bool:
+    def _prepare_context(self) -> None:
+        """Run ensure_context off the startup path and signal when it is done."""
+        start_time = time.perf_counter()
+        try:
+            if self.context_manager.has_context():
+                # The notes stored by the last run are good enough while the vault is re-checked
+                self.context_ready.set()
+            self.ensure_context()
+        except Exception as e:
+            logger.error(f"Initial indexing failed: {e}")
+        finally:
+            self.context_ready.set()
+        logger.info(f"Context ready in {time.perf_counter() - start_time:.2f}s")
+        self.context_manager.refresh_background()
+
+    def indexing_progress(self) -> Optional[Tuple[int, int]]:
+        """(notes read, notes to read) while the initial indexing runs, None once it is done."""
+        if self.context_ready.is_set():
+            return None
+        return self.context_manager.progress
+
+    def refresh_context(self, full: bool = False) -> bool:
         """Refresh the Obsidian context."""
-        return self.context_manager.refresh_context()
+        return self.context_manager.refresh_context(full=full)
+
+    def warm_up(self, background: bool = True) -> None:
+        """Preload the provider's models so the first notification is not a cold start."""
+        if background:
+            threading.Thread(target=self.ai_provider.warm_up, name="provider-warm-up", daemon=True).start()
+        else:
+            self.ai_provider.warm_up()
+
+    def shutdown(self) -> None:
+        """Stop background workers."""
+        for watcher in self.vault_watchers:
+            watcher.stop()
 
     def switch_ai_provider(self, use_local_ai: bool, gemini_api_key: Optional[str] = None) -> bool:
         """Switch between local and cloud AI providers."""
@@ -89,8 +326,13 @@ class AIAssistant:
                 new_provider = OllamaProvider()
             else:
                 new_provider = GeminiProvider(api_key=gemini_api_key)
+            new_provider = self._with_hedging(new_provider, gemini_api_key)
             self.ai_provider = new_provider
             self.screenshot_analyzer.ai_provider = new_provider
+            if self.quote_cache is not None:
+                self.quote_cache.clear()
+            if Config.OLLAMA_PRELOAD_ON_START:
+                self.warm_up()
             provider_name = "Ollama (local)" if use_local_ai else "Gemini"
             logger.info(f"Switched to {provider_name} AI provider")
             return True
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+from source.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Per-backend circuit breaker driven by the failure rate of recent calls.
+
+    CLOSED: calls pass and outcomes are tracked. When the failure rate of the
+    last `window` calls reaches `failure_rate` the circuit OPENs and calls fail
+    immediately. After `cooldown` seconds the next caller runs the cheap
+    `probe` (if any); if it passes, a single trial call is let through
+    (HALF_OPEN) and its outcome closes or re-opens the circuit. A trial that
+    is cancelled, or never reports back within `cooldown + call_timeout`,
+    hands the trial to the next caller.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        probe: Optional[Callable[[], bool]] = None,
+        failure_rate: float = Config.BREAKER_FAILURE_RATE,
+        window: int = Config.BREAKER_WINDOW,
+        min_calls: int = Config.BREAKER_MIN_CALLS,
+        cooldown: float = Config.BREAKER_COOLDOWN_SECONDS,
+        call_timeout: float = Config.OLLAMA_TIMEOUT
+    ):
+        self.name = name
+        self.probe = probe
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.call_timeout = call_timeout
+        self.state = self.CLOSED
+        self._results = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_started = 0.0
+        self._trial_thread: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the backend right now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.HALF_OPEN:
+                if now - self._trial_started < self.cooldown + self.call_timeout:
+                    return False
+                logger.warning(f"{self.name} trial call never reported back, starting another")
+            elif now - self._opened_at < self.cooldown:
+                return False
+            # Cooldown elapsed: this caller probes on behalf of everyone else
+            self.state = self.HALF_OPEN
+            self._trial_started = now
+            self._trial_thread = threading.get_ident()
+
+        if self.probe is not None and not self._run_probe():
+            with self._lock:
+                self._open("health probe failed")
+            return False
+        return True
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if the call must not be made."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"{self.name} circuit is open, skipping call")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} circuit closed")
+            self.state = self.CLOSED
+            self._results.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open("trial call failed")
+                return
+            self._results.append(False)
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures / len(self._results) >= self.failure_rate:
+                self._open(f"{failures}/{len(self._results)} recent calls failed")
+
+    def record_cancelled(self) -> None:
+        """The call was aborted before its outcome was known; release the trial if it was one."""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._trial_thread == threading.get_ident():
+                # The cooldown has already passed, so the next caller runs a new trial
+                self.state = self.OPEN
+
+    def _open(self, reason: str) -> None:
+        """Caller holds _lock."""
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._results.clear()
+        logger.warning(f"{self.name} circuit opened for {self.cooldown:.0f}s: {reason}")
+
+    def _run_probe(self) -> bool:
+        try:
+            return bool(self.probe())
+        except Exception as e:
+            logger.info(f"{self.name} health probe error: {e}")
+            return False
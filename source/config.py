@@ -4,18 +4,130 @@ class Config:
     """Application configuration constants."""
     
     # File paths
-    CONTEXT_SNAPSHOT_FILENAME = "context_snapshot.txt"
+    CONTEXT_STORE_FILENAME = "context_store.sqlite3"
     OBSIDIAN_CONFIG_PATH = os.path.expandvars(r"%APPDATA%\Obsidian\obsidian.json")
-    TEMP_SCREENSHOT_PATH = "temp_screenshot.png"
     
     # Obsidian settings
+    VAULTS = None  # names or paths of the vaults to index; None indexes every vault in obsidian.json
+    VAULT_INDEX_PROCESSES = None  # vaults indexed in parallel; None uses one process per core
     DEFAULT_EXCLUDED_DIRS = {".obsidian", "унік", "Навчання поза уніком", "Матеріальна частина"}
+    VAULT_READ_WORKERS = 8
+    VAULT_READ_QUEUE_FACTOR = 4
+    VAULT_READ_TARGET_FILES_PER_SEC = 2000
+    VAULT_READ_TARGET_MB_PER_SEC = 50
+    VAULT_READ_MIN_SAMPLE = 500
+    
+    # Vault watcher settings
+    WATCH_VAULT = True
+    WATCH_DEBOUNCE_SECONDS = 5
+    WATCH_MAX_DELAY_SECONDS = 60
+    WATCH_POLL_INTERVAL_SECONDS = 30
+    
+    # Retrieval settings
+    CONTEXT_TOKEN_BUDGET = 2000
+    CHARS_PER_TOKEN = 4
+    RETRIEVAL_CHUNK_CHARS = 1200
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+    
+    # Embedding settings (semantic retrieval fused with BM25)
+    EMBEDDINGS_ENABLED = False  # needs the OLLAMA_EMBED_MODEL pulled in Ollama
+    EMBEDDING_BATCH_SIZE = 32  # chunks per embed request
+    EMBEDDING_NOTE_BATCH = 64  # notes committed together while syncing
+    EMBEDDING_TOP_K = 20
+    RRF_K = 60  # reciprocal rank fusion constant
+    
+    # Notification settings
+    PIPELINE_MODE = "two_stage"  # "two_stage" (describe, then quote) or "fused" (one multimodal call)
+    NOTIFICATION_WORKERS = 2
+    NOTIFICATION_DEADLINE_SECONDS = 120
+    NOTIFICATIONS_PER_HOUR = 2  # on average, while the user is active
+    
+    # Activity settings (skip model runs while the machine is idle, locked or the screen is unchanged)
+    ACTIVITY_ENABLED = True
+    ACTIVITY_IDLE_SECONDS = 5 * 60  # no keyboard or mouse input for this long counts as away
+    ACTIVITY_SCREEN_CHANGE_BITS = 6  # frames differing by at most this many of 64 hash bits are unchanged
+    ACTIVITY_BUSY_SCREEN_BITS = 20  # a bigger change shortens the interval
+    ACTIVITY_BACKOFF = 1.5  # interval factor after a skipped slot (and divisor on a busy screen)
+    ACTIVITY_MIN_INTERVAL_MINUTES = 15
+    ACTIVITY_MAX_INTERVAL_MINUTES = 120
+    ACTIVITY_BATTERY_INTERVAL_FACTOR = 2  # longer intervals on battery
+    
+    # Metrics settings
+    METRICS_JSONL_PATH = "pipeline_metrics.jsonl"  # one line per notification
+    METRICS_PROMETHEUS_PATH = "pipeline_metrics.prom"  # text format, rewritten after each notification
+    METRICS_HTTP_PORT = None  # e.g. 9464 to also serve /metrics on localhost
+    
+    # Prefetch settings (run the pipeline ahead of each scheduled slot)
+    PREFETCH_ENABLED = True
+    PREFETCH_DEFAULT_LEAD_SECONDS = 45  # until pipeline latency has been measured
+    PREFETCH_LEAD_FACTOR = 1.5  # lead time = slow-tail latency * factor
+    PREFETCH_MIN_LEAD_SECONDS = 5
+    PREFETCH_MAX_LEAD_SECONDS = 300
+    PREFETCH_LATENCY_WINDOW = 20
+    PREFETCH_MAX_AGE_SECONDS = 600  # older results are regenerated even if the screen is unchanged
+    
+    # Summary settings (cached note -> folder -> vault digest prepended to the context)
+    SUMMARIES_ENABLED = False  # one model call per new or edited note; the first build of a big vault takes a while
+    SUMMARY_WORKERS = 1  # concurrent summary calls, kept low so notifications are not starved
+    SUMMARY_FAN_IN = 20  # summaries merged per call when rolling up folders and the vault
+    SUMMARY_MAX_TOKENS = 120
+    SUMMARY_NOTE_MAX_CHARS = 6000  # longer notes are cut before summarizing
+    SUMMARY_DIGEST_TOKENS = 600  # part of CONTEXT_TOKEN_BUDGET given to the digest
+    
+    # Quote cache settings
+    QUOTE_CACHE_ENABLED = True
+    QUOTE_CACHE_SIZE = 64
+    QUOTE_CACHE_TTL_SECONDS = 60 * 60
+    QUOTE_CACHE_CANDIDATES = 3  # distinct generations kept per key before reuse
+    
+    # Screenshot settings
+    CAPTURE_MODE = "window"  # "window" (foreground window), "monitor" (its monitor) or "screen" (every monitor)
+    CAPTURE_MIN_SIDE = 200  # smaller windows (e.g. a popup) fall back to the whole screen
+    SCREENSHOT_FORMAT = "JPEG"  # JPEG, WEBP or PNG
+    SCREENSHOT_QUALITY = 80
+    SCREEN_CACHE_ENABLED = True
+    SCREEN_CACHE_PATH = "screen_cache.json"
+    SCREEN_CACHE_SIZE = 32
+    SCREEN_CACHE_TTL_SECONDS = 30 * 60
+    SCREEN_HASH_THRESHOLD = 6  # max differing bits out of 64
+    
+    # Hedging settings (race the other provider when the primary is slow)
+    HEDGING_ENABLED = False  # doubles requests in the slow tail; Gemini calls are billed
+    HEDGE_PERCENTILE = 0.9
+    HEDGE_INITIAL_DELAY_SECONDS = 20
+    HEDGE_MIN_DELAY_SECONDS = 2
+    HEDGE_MAX_DELAY_SECONDS = 60
+    HEDGE_MIN_SAMPLES = 5
+    HEDGE_WINDOW = 50
+    HEDGE_WORKERS = 4
+    
+    # Circuit breaker settings (per provider)
+    BREAKER_FAILURE_RATE = 0.5  # open when this share of recent calls failed
+    BREAKER_WINDOW = 10
+    BREAKER_MIN_CALLS = 2
+    BREAKER_COOLDOWN_SECONDS = 60
     
     # Ollama settings
     OLLAMA_TEXT_MODEL = "gemma3:4b"
     OLLAMA_VISION_MODEL = "gemma3:4b"
     OLLAMA_URL = "http://localhost:11434/api/generate"
-    OLLAMA_TIMEOUT = 180
+    OLLAMA_EMBED_MODEL = "paraphrase-multilingual"  # covers Ukrainian and English notes
+    OLLAMA_TIMEOUT = 180  # read timeout: a cold model load can take minutes
+    OLLAMA_CONNECT_TIMEOUT = 3  # fail fast when the server is not listening
+    OLLAMA_PROBE_TIMEOUT = 2
+    OLLAMA_VISION_MAX_SIDE = 896
+    OLLAMA_POOL_SIZE = 4
+    OLLAMA_KEEP_ALIVE = "30m"  # how long Ollama keeps models loaded; -1 keeps them forever
+    OLLAMA_PRELOAD_ON_START = True
+    OLLAMA_STREAM_QUOTES = True
+    OLLAMA_QUOTE_MAX_TOKENS = 400  # hard cap, includes any <think> tokens
+    OLLAMA_QUOTE_MIN_CHARS = 12  # shorter "sentences" (e.g. "Hey.") don't end the stream
     
     # Gemini settings
-    GEMINI_MODEL = "gemini-2.5-flash-preview-05-20"
\ No newline at end of file
+    GEMINI_MODEL = "gemini-2.5-flash-preview-05-20"
+    GEMINI_VISION_MAX_SIDE = 1536
+    GEMINI_TIMEOUT = 60  # per request; keep below NOTIFICATION_DEADLINE_SECONDS
+    GEMINI_CACHE_ENABLED = True  # cache the instructions + notes prefix of quote prompts
+    GEMINI_CACHE_MIN_TOKENS = 1024  # Gemini rejects smaller caches
+    GEMINI_CACHE_TTL_SECONDS = 3600
\ No newline at end of file
@@ -1,97 +1,411 @@
 import os
 import json
-from pathlib import Path
+import hashlib
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from source.config import Config
+from source.context_store import ContextStore
+from source.retrieval import BM25Index, estimate_tokens
+from source.summaries import VaultSummarizer
 import logging
 
+if TYPE_CHECKING:
+    from source.embeddings import EmbeddingIndex
+
 logger = logging.getLogger(__name__)
 
 
 class ObsidianContextManager:
     """Manages Obsidian vault context extraction."""
-    
-    def __init__(self):
+
+    def __init__(self, vault_path: Optional[Path] = None, store_path: Optional[Path] = None):
+        """
+        :param vault_path: Vault to index instead of the one from the Obsidian config.
+        :param store_path: SQLite store to use instead of Config.CONTEXT_STORE_FILENAME.
+        """
         self.config_path = Path(Config.OBSIDIAN_CONFIG_PATH)
-        self.context_file = Path(Config.CONTEXT_SNAPSHOT_FILENAME)
+        self.vault_path = Path(vault_path) if vault_path else None
+        self.store = ContextStore(Path(store_path or Config.CONTEXT_STORE_FILENAME))
         self.excluded_dirs = Config.DEFAULT_EXCLUDED_DIRS
-    
+        self._index: Optional[BM25Index] = None
+        self._index_version = -1
+        self._context_cache: Optional[str] = None
+        self._context_version = -1
+        self._index_lock = threading.RLock()
+        self._update_lock = threading.RLock()
+        self.summarizer: Optional[VaultSummarizer] = None
+        self.embeddings: Optional["EmbeddingIndex"] = None
+        # (notes read, notes to read) of the running update, for progress display
+        self.progress: Tuple[int, int] = (0, 0)
+
+    @property
+    def shards(self) -> List["ObsidianContextManager"]:
+        """Single-vault managers behind this one (the vault watcher runs one per shard)."""
+        return [self]
+
+    def has_context(self) -> bool:
+        """Check whether the store already holds indexed notes."""
+        return self.store.vault is not None
+
+    def note_count(self) -> int:
+        return len(self.store)
+
     def get_current_context(self) -> str:
         """Get current context, generating if necessary."""
-        if not self.context_file.exists():
-            logger.info("Context file not found, generating new context...")
+        if not self.has_context():
+            logger.info("Context store is empty, generating new context...")
             self.generate_context_snapshot()
-        
+
         try:
-            return self.context_file.read_text(encoding='utf-8')
+            version = self.store.version
+            if self._context_cache is None or self._context_version != version:
+                self._context_cache = self._render_context()
+                self._context_version = version
+            return self._context_cache
         except Exception as e:
-            logger.error(f"Error reading context file: {e}")
+            logger.error(f"Error reading context store: {e}")
             return ""
-    
+
+    def get_relevant_context(self, query: str, token_budget: int = Config.CONTEXT_TOKEN_BUDGET) -> str:
+        """Get the notes most relevant to query, trimmed to token_budget."""
+        if not self.has_context():
+            logger.info("Context store is empty, generating new context...")
+            self.generate_context_snapshot()
+
+        try:
+            digest = self.get_digest(min(Config.SUMMARY_DIGEST_TOKENS, token_budget // 2))
+            parts = self.get_scored_context(query, token_budget - estimate_tokens(digest))
+            notes = "\n".join(part for _, part in parts)
+            return f"{digest}\n{notes}" if digest else notes
+        except Exception as e:
+            logger.error(f"Error retrieving relevant context: {e}")
+            return ""
+
+    def get_scored_context(self, query: str, token_budget: int) -> List[Tuple[float, str]]:
+        """Rendered chunks relevant to query with their ranking scores, best first."""
+        hits = self._semantic_search(query)
+        with self._index_lock:
+            return self._get_index().scored_context(query, token_budget, hits)
+
+    def enable_summaries(self, summarize: Callable[[str, str], str]) -> None:
+        """Prepend a cached vault digest, built with summarize(text, kind), to retrieved context."""
+        self.summarizer = VaultSummarizer(self.store, summarize)
+
+    def refresh_background(self) -> None:
+        """Start the embedding sync and summary rebuild, if enabled."""
+        if self.embeddings is not None:
+            self.embeddings.sync_async()
+        if self.summarizer is not None:
+            self.summarizer.refresh_async()
+
+    def enable_embeddings(self, embedder=None) -> None:
+        """Fuse embedding search into retrieval; embeds with Ollama unless embedder is given."""
+        # NumPy is only loaded when semantic retrieval is used
+        from source.embeddings import EmbeddingIndex, OllamaEmbedder
+        # The vectors live next to the store they index
+        matrix_path = self.store.db_path.with_suffix(".vectors.f32")
+        self.embeddings = EmbeddingIndex(self.store, embedder or OllamaEmbedder(), matrix_path)
+
+    def _semantic_search(self, query: str) -> List[Tuple[str, int]]:
+        """(path, chunk index) of the chunks closest to query, scheduling a sync when the notes moved on."""
+        if self.embeddings is None:
+            return []
+        if self.embeddings.is_stale():
+            self.embeddings.sync_async()
+        try:
+            return [(path, index) for path, index, _ in self.embeddings.search(query)]
+        except Exception as e:
+            logger.warning(f"Semantic search failed, using BM25 only: {e}")
+            return []
+
+    def get_digest(self, token_budget: int) -> str:
+        """Return the current vault digest, scheduling a rebuild when the notes moved on."""
+        if self.summarizer is None:
+            return ""
+        if self.summarizer.is_stale():
+            self.summarizer.refresh_async()
+        return self.summarizer.digest(token_budget)
+
+    def read_note(self, rel_path: str, max_chars: Optional[int] = None) -> Optional[str]:
+        """Read a single stored note by its vault-relative path."""
+        return self.store.read_note(rel_path, max_chars)
+
+    def read_folder(self, folder: str, recursive: bool = True) -> Iterator[Tuple[str, str]]:
+        """Yield (path, content) for the stored notes of a vault folder."""
+        return self.store.read_folder(folder, recursive)
+
+    def _get_index(self) -> BM25Index:
+        """Return the BM25 index, rebuilding it when the store moved on.
+
+        Callers must hold _index_lock.
+        """
+        version = self.store.version
+        if self._index is None or self._index_version != version:
+            index = BM25Index()
+            for rel_path, _, title, content, mtime in self.store.iter_notes():
+                index.add_note(rel_path, title, content, mtime)
+            logger.info(f"BM25 index built with {len(index)} chunks")
+            self._index = index
+            self._index_version = version
+        return self._index
+
+    def _render_context(self) -> str:
+        """Render every stored note, grouped by folder."""
+        parts = []
+        current_folder = None
+        for _, folder, title, content, _ in self.store.iter_notes():
+            if folder != current_folder:
+                folder_name = self.store.vault if folder == "." else folder
+                parts.append(f"Назва папки: {PurePosixPath(folder_name).name}\n")
+                current_folder = folder
+            parts.append(f"Назва файлу: {title}\nТекст файлу: <<{content}>>\n")
+        return '\n'.join(parts)
+
     def generate_context_snapshot(self) -> bool:
-        """Generate context snapshot from Obsidian vault."""
+        """Generate or incrementally update the context store from Obsidian vault."""
+        vault_path = self.resolve_vault_path()
+        if vault_path is None:
+            return False
+
+        with self._update_lock:
+            try:
+                return self._update_store(vault_path)
+            except Exception as e:
+                logger.error(f"Error generating context snapshot: {e}")
+                return False
+
+    def resolve_vault_path(self) -> Optional[Path]:
+        """Read the vault location from the Obsidian config."""
+        if self.vault_path is not None:
+            return self.vault_path
+
         if not self.config_path.exists():
             logger.error(f"Obsidian config not found at {self.config_path}")
-            return False
-        
+            return None
+
         try:
-            # Load Obsidian config
             with open(self.config_path, "r", encoding="utf-8") as f:
                 config_data = json.load(f)
-            
-            # Get vault paths
+
             vaults = [vault["path"] for vault in config_data["vaults"].values()]
-            if not vaults:
-                logger.error("No vaults found in Obsidian config")
-                return False
-            
-            # Use first vault (TODO: Allow user selection)
-            vault_path = Path(vaults[0])
-            
-            # Extract content
-            content = self._extract_vault_content(vault_path)
-            
-            # Save context
-            self.context_file.write_text(content, encoding='utf-8')
-            logger.info(f"Context snapshot generated with {len(content)} characters")
-            return True
-            
         except Exception as e:
-            logger.error(f"Error generating context snapshot: {e}")
+            logger.error(f"Error reading Obsidian config: {e}")
+            return None
+
+        if not vaults:
+            logger.error("No vaults found in Obsidian config")
+            return None
+
+        # Single-vault manager; ShardedContextManager indexes every vault
+        return Path(vaults[0])
+
+    def iter_vault_notes(self, vault_path: Path) -> Iterator[Tuple[str, Path, os.stat_result]]:
+        """Lazily walk the vault, yielding notes folder by folder in a stable order."""
+        pending_dirs = [vault_path]
+
+        while pending_dirs:
+            folder = pending_dirs.pop()
+            try:
+                with os.scandir(folder) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                logger.warning(f"Could not list {folder}: {e}")
+                continue
+
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        # Filter out excluded directories
+                        if entry.name not in self.excluded_dirs:
+                            subdirs.append(Path(entry.path))
+                    elif entry.name.endswith(".md"):
+                        file_path = Path(entry.path)
+                        rel_path = file_path.relative_to(vault_path).as_posix()
+                        yield rel_path, file_path, entry.stat()
+                except OSError as e:
+                    logger.warning(f"Could not stat {entry.path}: {e}")
+
+            pending_dirs.extend(reversed(subdirs))
+
+    def _update_store(self, vault_path: Path) -> bool:
+        """Re-read only added or modified notes and patch the store."""
+        manifest = self.store.get_manifest() if self.store.vault == str(vault_path) else {}
+
+        # Only metadata is held for the whole vault; note bodies are streamed
+        scanned = list(self.iter_vault_notes(vault_path))
+        scanned_paths = {rel_path for rel_path, _, _ in scanned}
+        deleted = [rel_path for rel_path in manifest if rel_path not in scanned_paths]
+        changed = [
+            note for note in scanned
+            if not self._is_unchanged(manifest.get(note[0]), note[2])
+        ]
+
+        if not changed and not deleted and manifest:
+            logger.info("Context store is up to date")
+            return True
+
+        self._apply_changes(vault_path, manifest, changed, deleted)
+        logger.info(f"Context store holds {len(scanned)} notes")
+        return True
+
+    def update_notes(self, file_paths: Iterable[Path]) -> bool:
+        """Incrementally apply changes of specific vault files (used by the watcher)."""
+        vault_path = self.resolve_vault_path()
+        if vault_path is None:
             return False
-    
-    def _extract_vault_content(self, vault_path: Path) -> str:
-        """Extract all markdown content from vault."""
-        all_content = []
-        
-        for root, dirs, files in os.walk(vault_path):
-            # Filter out excluded directories
-            dirs[:] = [d for d in dirs if d not in self.excluded_dirs]
-            
-            folder_name = os.path.basename(root)
-            all_content.append(f"Назва папки: {folder_name}\n")
-            
-            # Process markdown files
-            for filename in files:
-                if filename.endswith(".md"):
-                    file_path = Path(root) / filename
-                    title = filename.removesuffix(".md")
-                    
-                    all_content.append(f"Назва файлу: {title}\n")
-                    
+
+        with self._update_lock:
+            try:
+                if self.store.vault != str(vault_path):
+                    return self._update_store(vault_path)
+
+                manifest = self.store.get_manifest()
+                changed = []
+                deleted = []
+                for file_path in set(Path(p) for p in file_paths):
+                    try:
+                        relative = file_path.relative_to(vault_path)
+                    except ValueError:
+                        continue
+                    if file_path.suffix != ".md" or self.excluded_dirs.intersection(relative.parts[:-1]):
+                        continue
+                    rel_path = relative.as_posix()
                     try:
-                        content = file_path.read_text(encoding='utf-8')
-                        all_content.append(f"Текст файлу: <<{content}>>\n")
-                    except Exception as e:
-                        logger.warning(f"Could not read {file_path}: {e}")
-        
-        return '\n'.join(all_content)
-    
-    def refresh_context(self) -> bool:
-        """Force refresh of context snapshot."""
-        if self.context_file.exists():
+                        stat = file_path.stat()
+                    except FileNotFoundError:
+                        if rel_path in manifest:
+                            deleted.append(rel_path)
+                        continue
+                    if not self._is_unchanged(manifest.get(rel_path), stat):
+                        changed.append((rel_path, file_path, stat))
+
+                if changed or deleted:
+                    self._apply_changes(vault_path, manifest, changed, deleted)
+                return True
+            except Exception as e:
+                logger.error(f"Error applying vault changes: {e}")
+                return False
+
+    def _apply_changes(
+        self,
+        vault_path: Path,
+        manifest: Dict[str, Tuple[int, int, str]],
+        changed: List[Tuple[str, Path, os.stat_result]],
+        deleted: List[str]
+    ) -> None:
+        """Read changed notes, commit them to the store and patch the BM25 index."""
+        with self._index_lock:
+            index = self._index if self._index_version == self.store.version else None
+            # Invalidate until the batch is committed; restored below on success
+            self._index_version = -1
+        stats = {"files": 0, "bytes": 0}
+        touches: List[Tuple[str, int, int]] = []
+        start_time = time.perf_counter()
+        self.progress = (0, len(changed))
+
+        def upserts():
+            for (rel_path, file_path, stat), result in self._read_notes(changed):
+                if result is None:
+                    continue
+                digest, text, size = result
+                stats["files"] += 1
+                stats["bytes"] += size
+                self.progress = (stats["files"], len(changed))
+                if stats["files"] % 1000 == 0:
+                    logger.info(f"Indexed {stats['files']}/{len(changed)} notes")
+                old_entry = manifest.get(rel_path)
+                if old_entry and old_entry[2] == digest:
+                    # Touched but not edited: only refresh the metadata
+                    touches.append((rel_path, stat.st_mtime_ns, stat.st_size))
+                    continue
+                folder = str(PurePosixPath(rel_path).parent)
+                if index is not None:
+                    with self._index_lock:
+                        index.add_note(rel_path, file_path.stem, text, stat.st_mtime_ns)
+                yield rel_path, folder, file_path.stem, stat.st_mtime_ns, stat.st_size, digest, text
+
+        # touches is filled while upserts() is consumed, before it is applied
+        version = self.store.apply_changes(str(vault_path), upserts(), touches, deleted)
+        elapsed = time.perf_counter() - start_time
+
+        if index is not None:
+            with self._index_lock:
+                for rel_path in deleted:
+                    index.remove_note(rel_path)
+                if self._index is index:
+                    self._index_version = version
+        self._log_throughput(stats["files"], stats["bytes"], elapsed)
+        logger.info(
+            f"Context store updated: {stats['files']} re-read, {len(deleted)} removed"
+        )
+
+    def _read_notes(self, notes: List[Tuple[str, Path, os.stat_result]]):
+        """Read notes on a thread pool, yielding results in order with a bounded window."""
+        window = Config.VAULT_READ_WORKERS * Config.VAULT_READ_QUEUE_FACTOR
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=Config.VAULT_READ_WORKERS) as pool:
+            for note in notes:
+                pending.append((note, pool.submit(self._read_note, note[1])))
+                # Bound the number of note bodies held in memory at once
+                while len(pending) >= window:
+                    note_done, future = pending.popleft()
+                    yield note_done, future.result()
+            while pending:
+                note_done, future = pending.popleft()
+                yield note_done, future.result()
+
+    @staticmethod
+    def _read_note(file_path: Path) -> Optional[Tuple[str, str, int]]:
+        """Read and hash a single note; runs on the reader pool."""
+        try:
+            raw = file_path.read_bytes()
+            return hashlib.sha256(raw).hexdigest(), raw.decode('utf-8'), len(raw)
+        except Exception as e:
+            logger.warning(f"Could not read {file_path}: {e}")
+            return None
+
+    @staticmethod
+    def _log_throughput(files_read: int, bytes_read: int, elapsed: float) -> None:
+        """Log vault read throughput and flag runs below the configured targets."""
+        if not files_read or elapsed <= 0:
+            return
+        files_per_sec = files_read / elapsed
+        mb_per_sec = bytes_read / elapsed / (1024 * 1024)
+        logger.info(f"Vault read throughput: {files_per_sec:.0f} files/s, {mb_per_sec:.1f} MB/s")
+        if files_read >= Config.VAULT_READ_MIN_SAMPLE and (
+            files_per_sec < Config.VAULT_READ_TARGET_FILES_PER_SEC
+            and mb_per_sec < Config.VAULT_READ_TARGET_MB_PER_SEC
+        ):
+            logger.warning(
+                f"Vault read throughput below target "
+                f"({Config.VAULT_READ_TARGET_FILES_PER_SEC} files/s or "
+                f"{Config.VAULT_READ_TARGET_MB_PER_SEC} MB/s)"
+            )
+
+    @staticmethod
+    def _is_unchanged(entry: Optional[Tuple[int, int, str]], stat: os.stat_result) -> bool:
+        """Check a stored (mtime, size, hash) entry against fresh file metadata."""
+        return entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size
+
+    def refresh_context(self, full: bool = False) -> bool:
+        """Refresh the context store, re-reading only changed notes unless full."""
+        with self._update_lock:
+            if full:
+                self.reset_store()
+            return self.generate_context_snapshot()
+
+    def reset_store(self) -> None:
+        """Drop every stored note so the next update re-reads the whole vault."""
+        with self._update_lock:
+            with self._index_lock:
+                self._index = None
             try:
-                self.context_file.unlink()
+                self.store.clear()
             except Exception as e:
-                logger.warning(f"Could not remove old context file: {e}")
-        
-        return self.generate_context_snapshot()
\ No newline at end of file
+                logger.warning(f"Could not clear context store: {e}")
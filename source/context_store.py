@@ -0,0 +1,222 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ContextStore:
+    """SQLite-backed store of vault notes keyed by vault-relative path."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS notes (
+            path TEXT PRIMARY KEY,
+            folder TEXT NOT NULL,
+            title TEXT NOT NULL,
+            mtime INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            content TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS notes_folder ON notes (folder);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS summaries (
+            key TEXT PRIMARY KEY,
+            summary TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS chunk_vectors (
+            row INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            chunk INTEGER NOT NULL,
+            note_hash TEXT NOT NULL,
+            chunk_hash TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS chunk_vectors_path ON chunk_vectors (path);
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            # WAL lets notification reads proceed while an update is being written
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def version(self) -> int:
+        """Monotonic counter bumped by every committed change."""
+        value = self._get_meta("version")
+        return int(value) if value else 0
+
+    @property
+    def vault(self) -> Optional[str]:
+        """Path of the vault the stored notes belong to."""
+        return self._get_meta("vault")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def get_manifest(self) -> Dict[str, Tuple[int, int, str]]:
+        """Return path -> (mtime, size, hash) for every stored note."""
+        rows = self._connect().execute("SELECT path, mtime, size, hash FROM notes")
+        return {path: (mtime, size, digest) for path, mtime, size, digest in rows}
+
+    def read_note(self, path: str, max_chars: Optional[int] = None) -> Optional[str]:
+        """Read one note, or only its first max_chars characters."""
+        conn = self._connect()
+        if max_chars is None:
+            row = conn.execute("SELECT content FROM notes WHERE path = ?", (path,)).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT substr(content, 1, ?) FROM notes WHERE path = ?", (max_chars, path)
+            ).fetchone()
+        return row[0] if row else None
+
+    def read_folder(self, folder: str, recursive: bool = True) -> Iterator[Tuple[str, str]]:
+        """Yield (path, content) for the notes of a folder ("." is the vault root)."""
+        conn = self._connect()
+        if recursive and folder != ".":
+            prefix = folder.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            rows = conn.execute(
+                "SELECT path, content FROM notes WHERE folder = ? OR folder LIKE ? ESCAPE '\\' "
+                "ORDER BY folder, path",
+                (folder, f"{prefix}/%")
+            )
+        elif recursive:
+            rows = conn.execute("SELECT path, content FROM notes ORDER BY folder, path")
+        else:
+            rows = conn.execute(
+                "SELECT path, content FROM notes WHERE folder = ? ORDER BY path", (folder,)
+            )
+        yield from rows
+
+    def iter_notes(self) -> Iterator[Tuple[str, str, str, str, int]]:
+        """Yield (path, folder, title, content, mtime) in folder order."""
+        yield from self._connect().execute(
+            "SELECT path, folder, title, content, mtime FROM notes ORDER BY folder, path"
+        )
+
+    def iter_note_hashes(self) -> Iterator[Tuple[str, str, str]]:
+        """Yield (path, folder, hash) in folder order, without reading note bodies."""
+        yield from self._connect().execute("SELECT path, folder, hash FROM notes ORDER BY folder, path")
+
+    def get_summaries(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Return key -> summary for the keys that have a stored summary."""
+        conn = self._connect()
+        found = {}
+        keys = list(keys)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, summary FROM summaries WHERE key IN ({','.join('?' * len(batch))})", batch
+            )
+            found.update(rows)
+        return found
+
+    def put_summary(self, key: str, summary: str) -> None:
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?)", (key, summary))
+
+    def prune_summaries(self, keep: Iterable[str]) -> int:
+        """Delete every summary whose key is not in keep; return how many were removed."""
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_keys (key TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM keep_keys")
+            conn.executemany("INSERT OR IGNORE INTO keep_keys VALUES (?)", ((key,) for key in keep))
+            removed = conn.execute("DELETE FROM summaries WHERE key NOT IN (SELECT key FROM keep_keys)").rowcount
+        return removed
+
+    def get_meta(self, key: str) -> Optional[str]:
+        return self._get_meta(key)
+
+    def set_meta(self, key: str, value: str) -> None:
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def iter_vector_rows(self) -> Iterator[Tuple[int, str, int, str, str]]:
+        """Yield (row, path, chunk, note hash, chunk hash) of every embedded chunk."""
+        yield from self._connect().execute(
+            "SELECT row, path, chunk, note_hash, chunk_hash FROM chunk_vectors ORDER BY row"
+        )
+
+    def replace_vector_rows(
+        self,
+        paths: Iterable[str],
+        rows: Iterable[Tuple[int, str, int, str, str]]
+    ) -> None:
+        """Drop the vector rows of paths and insert (row, path, chunk, note hash, chunk hash) rows, atomically."""
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.executemany("DELETE FROM chunk_vectors WHERE path = ?", ((path,) for path in paths))
+            conn.executemany("INSERT OR REPLACE INTO chunk_vectors VALUES (?, ?, ?, ?, ?)", rows)
+
+    def clear_vectors(self) -> None:
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute("DELETE FROM chunk_vectors")
+
+    def apply_changes(
+        self,
+        vault: str,
+        upserts: Iterable[Tuple[str, str, str, int, int, str, str]] = (),
+        touches: Iterable[Tuple[str, int, int]] = (),
+        deletes: Iterable[str] = ()
+    ) -> int:
+        """Apply one batch of note changes atomically and return the new version.
+
+        upserts are (path, folder, title, mtime, size, hash, content) rows,
+        touches are (path, mtime, size) for notes whose content did not change.
+        """
+        conn = self._connect()
+        with self._write_lock, conn:
+            if self._get_meta("vault") != vault:
+                conn.execute("DELETE FROM notes")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('vault', ?)", (vault,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO notes (path, folder, title, mtime, size, hash, content) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                upserts
+            )
+            conn.executemany("UPDATE notes SET mtime = ?, size = ? WHERE path = ?",
+                             ((mtime, size, path) for path, mtime, size in touches))
+            conn.executemany("DELETE FROM notes WHERE path = ?", ((path,) for path in deletes))
+            version = self.version + 1
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(version),))
+        return version
+
+    def clear(self) -> None:
+        """Remove every stored note and forget the vault."""
+        conn = self._connect()
+        with self._write_lock, conn:
+            version = self.version + 1
+            conn.execute("DELETE FROM notes")
+            conn.execute("DELETE FROM meta WHERE key = 'vault'")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(version),))
+
+    def folders(self) -> List[str]:
+        """List every folder that holds at least one note."""
+        rows = self._connect().execute("SELECT DISTINCT folder FROM notes ORDER BY folder")
+        return [row[0] for row in rows]
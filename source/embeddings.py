@@ -0,0 +1,290 @@
+import hashlib
+import threading
+import time
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+from source.ai_providers import get_http_session
+from source.config import Config
+from source.context_store import ContextStore
+from source.retrieval import split_into_chunks
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Embedder(Protocol):
+    """Anything that turns texts into a (len(texts), dim) float32 matrix."""
+
+    model: str
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        ...
+
+
+class OllamaEmbedder:
+    """Embeds texts with Ollama's /api/embed endpoint."""
+
+    def __init__(self, model: str = Config.OLLAMA_EMBED_MODEL, url: Optional[str] = None):
+        self.model = model
+        self.url = url or Config.OLLAMA_URL.split("/api/", 1)[0] + "/api/embed"
+        self.session = get_http_session()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = self.session.post(
+            self.url,
+            json={"model": self.model, "input": texts, "keep_alive": Config.OLLAMA_KEEP_ALIVE},
+            timeout=(Config.OLLAMA_CONNECT_TIMEOUT, Config.OLLAMA_TIMEOUT)
+        )
+        response.raise_for_status()
+        return np.asarray(response.json()["embeddings"], dtype=np.float32)
+
+
+class EmbeddingIndex:
+    """Unit-length chunk embeddings in a memory-mapped float32 matrix.
+
+    Row i of the matrix file holds one chunk; which note and chunk it belongs
+    to is kept in the context store, next to the notes. Rows are reused by
+    chunk content hash, so an edited note only re-embeds the paragraphs that
+    changed. Freed rows are recycled by later syncs.
+    """
+
+    def __init__(self, store: ContextStore, embedder: Embedder, matrix_path: Path):
+        self.store = store
+        self.embedder = embedder
+        self.matrix_path = Path(matrix_path)
+        self.chunk_chars = Config.RETRIEVAL_CHUNK_CHARS
+        self._matrix: Optional[np.memmap] = None
+        self._dim = 0
+        # row -> (path, chunk index, chunk hash); None for free rows
+        self._row_keys: List[Optional[Tuple[str, int, str]]] = []
+        # path -> (note hash, rows)
+        self._notes: Dict[str, Tuple[str, List[int]]] = {}
+        self._chunk_rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._synced_version = -1
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._row_keys) - len(self._free)
+
+    def _load(self) -> None:
+        """Open the matrix and rebuild the row maps from the store."""
+        dim = int(self.store.get_meta("embedding_dim") or 0)
+        if self.store.get_meta("embedding_model") != self.embedder.model or not dim:
+            self._reset()
+            return
+        rows = list(self.store.iter_vector_rows())
+        if not rows:
+            # Every note was deleted, or a crash came before the first vector was written
+            self._reset()
+            return
+        n_rows = rows[-1][0] + 1
+        file_rows = self.matrix_path.stat().st_size // (dim * 4) if self.matrix_path.exists() else 0
+        if file_rows < n_rows:
+            logger.warning("Embedding matrix is shorter than its index, rebuilding")
+            self._reset()
+            return
+        self._dim = dim
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(file_rows, dim))
+        self._row_keys = [None] * n_rows
+        for row, path, chunk, note_hash, chunk_hash in rows:
+            self._row_keys[row] = (path, chunk, chunk_hash)
+            self._notes.setdefault(path, (note_hash, []))[1].append(row)
+            self._chunk_rows[chunk_hash] = row
+        self._free = [row for row, key in enumerate(self._row_keys) if key is None]
+        logger.info(f"Loaded {len(self)} chunk embeddings ({dim} dimensions)")
+
+    def _reset(self) -> None:
+        """Forget every vector, e.g. after the embedding model changed."""
+        self.store.clear_vectors()
+        self.store.set_meta("embedding_model", self.embedder.model)
+        self.store.set_meta("embedding_dim", "0")
+        with self._lock:
+            self._close_matrix()
+            self._dim = 0
+            self._row_keys, self._notes, self._chunk_rows, self._free = [], {}, {}, []
+        if self.matrix_path.exists():
+            self.matrix_path.unlink()
+
+    def _ensure_capacity(self, rows: int) -> None:
+        """Grow the matrix file (by doubling) so it holds at least rows rows."""
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, 1024)
+        # Searches wait until the file is mapped again
+        with self._lock:
+            self._close_matrix()
+            with open(self.matrix_path, "ab") as f:
+                f.truncate(capacity * self._dim * 4)
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+
+    def _close_matrix(self) -> None:
+        """Flush and unmap the matrix; Windows can't resize or delete a mapped file. Caller holds _lock."""
+        if self._matrix is None:
+            return
+        matrix, self._matrix = self._matrix, None
+        matrix.flush()
+        # Dropping the array is not enough while a view of it is still alive somewhere
+        matrix._mmap.close()
+
+    def is_stale(self) -> bool:
+        """Check whether the notes changed since the last sync."""
+        return self._synced_version != self.store.version
+
+    def sync_async(self) -> None:
+        """Sync on a background thread, unless a sync is already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.sync, name="embedding-sync", daemon=True)
+            self._thread.start()
+
+    def sync(self) -> int:
+        """Embed the chunks of new or edited notes and drop deleted ones; return chunks embedded."""
+        with self._sync_lock:
+            start_time = time.perf_counter()
+            version = self.store.version
+            current = {path: note_hash for path, _, note_hash in self.store.iter_note_hashes()}
+            deleted = [path for path in self._notes if path not in current]
+            changed = [path for path, note_hash in current.items()
+                       if path not in self._notes or self._notes[path][0] != note_hash]
+            embedded = 0
+            try:
+                self._apply(deleted, [])
+                batch: List[str] = []
+                for path in changed:
+                    batch.append(path)
+                    if len(batch) >= Config.EMBEDDING_NOTE_BATCH:
+                        embedded += self._apply(batch, [(p, current[p]) for p in batch])
+                        batch = []
+                if batch:
+                    embedded += self._apply(batch, [(p, current[p]) for p in batch])
+            except Exception as e:
+                logger.error(f"Error embedding notes: {e}")
+                return embedded
+            self._synced_version = version
+            if changed or deleted:
+                logger.info(
+                    f"Embeddings synced in {time.perf_counter() - start_time:.1f}s: {embedded} chunks embedded, "
+                    f"{len(changed)} notes updated, {len(deleted)} removed, {len(self)} chunks indexed"
+                )
+            return embedded
+
+    def _apply(self, paths: List[str], notes: List[Tuple[str, str]]) -> int:
+        """Replace the vectors of paths with those of notes ((path, note hash) pairs)."""
+        texts, targets, copies, rows = [], [], [], []
+        new_notes: Dict[str, Tuple[str, List[int]]] = {}
+        reused: List[int] = []
+        appended = 0
+
+        def allocate() -> int:
+            nonlocal appended
+            if self._free:
+                reused.append(self._free.pop())
+                return reused[-1]
+            appended += 1
+            return len(self._row_keys) + appended - 1
+
+        try:
+            for path, note_hash in notes:
+                content = self.store.read_note(path)
+                if content is None:
+                    continue
+                title = PurePosixPath(path).stem
+                note_rows = []
+                for index, chunk in enumerate(split_into_chunks(content, self.chunk_chars)):
+                    text = f"{title}\n{chunk}"
+                    chunk_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                    row = allocate()
+                    source_row = self._chunk_rows.get(chunk_hash)
+                    if source_row is not None:
+                        copies.append((row, source_row))
+                    else:
+                        texts.append(text)
+                        targets.append(row)
+                    rows.append((row, path, index, note_hash, chunk_hash))
+                    note_rows.append(row)
+                new_notes[path] = (note_hash, note_rows)
+
+            vectors = self._embed(texts)
+            if vectors is not None and not self._dim:
+                self._dim = vectors.shape[1]
+                self.store.set_meta("embedding_dim", str(self._dim))
+            if rows:
+                # New vectors only go to free or appended rows, so a crash before the
+                # store commit below leaves the committed rows intact
+                self._ensure_capacity(len(self._row_keys) + appended)
+                if targets:
+                    self._matrix[targets] = vectors
+                for row, source_row in copies:
+                    self._matrix[row] = self._matrix[source_row]
+                self._matrix.flush()
+            self.store.replace_vector_rows(paths, rows)
+        except Exception:
+            self._free.extend(reused)
+            raise
+
+        with self._lock:
+            self._row_keys.extend([None] * appended)
+            freed = []
+            for path in paths:
+                _, old_rows = self._notes.pop(path, ("", []))
+                freed.extend(old_rows)
+            for row in freed:
+                chunk_hash = self._row_keys[row][2]
+                if self._chunk_rows.get(chunk_hash) == row:
+                    del self._chunk_rows[chunk_hash]
+                self._row_keys[row] = None
+            for row, path, index, _, chunk_hash in rows:
+                self._row_keys[row] = (path, index, chunk_hash)
+                self._chunk_rows[chunk_hash] = row
+            self._notes.update(new_notes)
+            self._free.extend(freed)
+        return len(texts)
+
+    def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Embed in batches and normalize, so cosine similarity is a dot product."""
+        if not texts:
+            return None
+        parts = [
+            self.embedder.embed(texts[start:start + Config.EMBEDDING_BATCH_SIZE])
+            for start in range(0, len(texts), Config.EMBEDDING_BATCH_SIZE)
+        ]
+        vectors = np.vstack(parts).astype(np.float32, copy=False)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def search(self, query: str, top_k: int = Config.EMBEDDING_TOP_K) -> List[Tuple[str, int, float]]:
+        """Return (path, chunk index, cosine similarity) of the chunks closest to query."""
+        if not len(self):
+            return []
+        vector = self._embed([query])[0]
+        return self.search_vector(vector, top_k)
+
+    def search_vector(self, vector: np.ndarray, top_k: int = Config.EMBEDDING_TOP_K) -> List[Tuple[str, int, float]]:
+        """Top-k cosine search of a unit-length vector over every stored chunk."""
+        with self._lock:
+            n_rows = len(self._row_keys)
+            if not n_rows or self._matrix is None:
+                return []
+            # One pass over the memory-mapped rows; pages are read by the OS, not copied into the heap
+            scores = self._matrix[:n_rows] @ vector
+            if self._free:
+                scores[self._free] = -np.inf
+            k = min(top_k, n_rows - len(self._free))
+            if k <= 0:
+                return []
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            # A sync may have claimed a free row that is not committed yet
+            return [
+                (*self._row_keys[row][:2], float(scores[row]))
+                for row in best if self._row_keys[row] is not None
+            ]
@@ -0,0 +1,175 @@
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Deque, Dict, List, Tuple
+from source.ai_providers import AIProvider
+from source.config import Config
+import logging
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class HedgedProvider(AIProvider):
+    """Sends each call to the primary provider and races the secondary if it is slow.
+
+    The hedge delay is a percentile of the primary's recent latencies for the
+    same operation, so the secondary only fires for the slow tail.
+    """
+
+    def __init__(
+        self,
+        primary: AIProvider,
+        secondary: AIProvider,
+        percentile: float = Config.HEDGE_PERCENTILE
+    ):
+        self.primary = primary
+        self.secondary = secondary
+        self.percentile = percentile
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.calls = 0
+        self._latencies: Dict[str, Deque[float]] = {}
+        # caller thread -> (future, provider, call) of the calls racing for it
+        self._racing: Dict[int, List[Tuple[Future, AIProvider, dict]]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=Config.HEDGE_WORKERS, thread_name_prefix="hedge")
+
+    def generate_quote(self, context: str, screenshot_description: str) -> str:
+        return self._hedge("generate_quote", context, screenshot_description)
+
+    def analyze_screenshot(self, image: "Image.Image") -> str:
+        return self._hedge("analyze_screenshot", image)
+
+    def generate_quote_from_screenshot(self, context: str, image: "Image.Image") -> str:
+        return self._hedge("generate_quote_from_screenshot", context, image)
+
+    def summarize(self, text: str, kind: str) -> str:
+        # Background work with no deadline: not worth a second request
+        return self.primary.summarize(text, kind)
+
+    def warm_up(self) -> bool:
+        primary_ready = self.primary.warm_up()
+        self.secondary.warm_up()
+        return primary_ready
+
+    def cancel(self, thread_id: int) -> None:
+        """Abort the calls racing on behalf of thread_id, on both providers."""
+        # Flags the caller, so no hedge is fired for it afterwards
+        super().cancel(thread_id)
+        with self._lock:
+            racing = list(self._racing.get(thread_id, ()))
+        for future, provider, call in racing:
+            self._cancel(future, provider, call)
+
+    def hedge_delay(self, operation: str) -> float:
+        """Seconds to wait for the primary before firing the secondary."""
+        with self._lock:
+            samples = sorted(self._latencies.get(operation, ()))
+        if len(samples) < Config.HEDGE_MIN_SAMPLES:
+            return Config.HEDGE_INITIAL_DELAY_SECONDS
+        index = max(0, math.ceil(self.percentile * len(samples)) - 1)
+        return min(max(samples[index], Config.HEDGE_MIN_DELAY_SECONDS), Config.HEDGE_MAX_DELAY_SECONDS)
+
+    def _record_latency(self, operation: str, latency: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(operation, deque(maxlen=Config.HEDGE_WINDOW)).append(latency)
+
+    def _submit(self, provider: AIProvider, operation: str, *args):
+        """Run provider.operation on the pool, remembering the worker thread for cancellation."""
+        call = {"thread": None, "start": time.monotonic(), "usage": {}, "image_bytes": 0}
+
+        def run():
+            call["thread"] = threading.get_ident()
+            try:
+                with provider.cancellable():
+                    return getattr(provider, operation)(*args)
+            finally:
+                # Usage is per thread: pick it up here, on the thread that made the call
+                call["usage"] = provider.last_usage
+                call["image_bytes"] = provider.last_image_bytes
+
+        future = self._executor.submit(run)
+        with self._lock:
+            self._racing.setdefault(threading.get_ident(), []).append((future, provider, call))
+        if self._calls().is_cancelled():
+            self._cancel(future, provider, call)
+        return future, call
+
+    def _hedge(self, operation: str, *args) -> str:
+        caller = threading.get_ident()
+        try:
+            return self._race(operation, *args)
+        finally:
+            with self._lock:
+                self._racing.pop(caller, None)
+
+    def _race(self, operation: str, *args) -> str:
+        if self._calls().is_cancelled():
+            return "Error: Call cancelled."
+        self.calls += 1
+        delay = self.hedge_delay(operation)
+        primary_future, primary_call = self._submit(self.primary, operation, *args)
+
+        done, _ = wait([primary_future], timeout=delay)
+        if done and not self._is_error(primary_future):
+            self._record_latency(operation, time.monotonic() - primary_call["start"])
+            return self._finish(self.primary, primary_future, primary_call)
+        if self._calls().is_cancelled():
+            # The primary is being aborted; a backup would only be aborted too
+            return self._finish(self.primary, primary_future, primary_call)
+
+        # Primary is slow (or already failed): race the secondary
+        self.hedges_fired += 1
+        logger.info(f"Hedging {operation}: primary gave no answer within {delay:.1f}s")
+        secondary_future, secondary_call = self._submit(self.secondary, operation, *args)
+        racing = {primary_future: (self.primary, primary_call), secondary_future: (self.secondary, secondary_call)}
+
+        pending = set(racing)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if self._is_error(future):
+                    continue
+                provider, call = racing[future]
+                if provider is self.primary:
+                    self._record_latency(operation, time.monotonic() - call["start"])
+                else:
+                    self.hedges_won += 1
+                for loser in pending:
+                    self._cancel(loser, *racing[loser])
+                logger.info(
+                    f"Hedge for {operation} won by {type(provider).__name__} "
+                    f"(fired {self.hedges_fired}/{self.calls}, secondary won {self.hedges_won})"
+                )
+                return self._finish(provider, future, call)
+
+        # Both failed: surface the primary's error
+        return self._finish(self.primary, primary_future, primary_call)
+
+    def _finish(self, provider: AIProvider, future, call: dict) -> str:
+        self.last_usage = call["usage"]
+        self.last_image_bytes = call["image_bytes"]
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"{type(provider).__name__} failed: {e}")
+            return f"Error: {e}"
+
+    @staticmethod
+    def _is_error(future) -> bool:
+        if future.exception() is not None:
+            return True
+        result = future.result()
+        return not isinstance(result, str) or result.startswith("Error")
+
+    @staticmethod
+    def _cancel(future, provider: AIProvider, call: dict) -> None:
+        """Stop the losing call: drop it if queued, abort its stream if running."""
+        if not future.cancel() and call["thread"] is not None:
+            # Closing a socket can block until the reader wakes up; don't make the winner wait
+            threading.Thread(target=provider.cancel, args=(call["thread"],), daemon=True).start()
@@ -0,0 +1,69 @@
+import base64
+import io
+from typing import TYPE_CHECKING
+from source.config import Config
+import logging
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class EncodedImage:
+    """A compressed in-memory image ready to be sent to a vision model."""
+
+    MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+    def __init__(self, data: bytes, image_format: str, width: int, height: int):
+        self.data = data
+        self.format = image_format
+        self.width = width
+        self.height = height
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def mime_type(self) -> str:
+        return self.MIME_TYPES[self.format]
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.data).decode()
+
+
+def downscale(image: "Image.Image", max_side: int) -> "Image.Image":
+    """Shrink image so its longer side is at most max_side, keeping the aspect ratio."""
+    width, height = image.size
+    scale = max_side / max(width, height)
+    if scale >= 1:
+        return image
+    # Integer box reduction first is much cheaper than resampling a 4K frame directly
+    factor = int(1 / scale)
+    if factor >= 2:
+        image = image.reduce(factor)
+    target = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if image.size != target:
+        from PIL import Image
+        image = image.resize(target, Image.BILINEAR)
+    return image
+
+
+def encode_image(
+    image: "Image.Image",
+    max_side: int,
+    image_format: str = Config.SCREENSHOT_FORMAT,
+    quality: int = Config.SCREENSHOT_QUALITY
+) -> EncodedImage:
+    """Downscale to the model's input resolution and compress in memory."""
+    image_format = image_format.upper()
+    image = downscale(image, max_side)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    if image_format == "PNG":
+        image.save(buffer, format="PNG", compress_level=1)
+    else:
+        image.save(buffer, format=image_format, quality=quality)
+    return EncodedImage(buffer.getvalue(), image_format, *image.size)
@@ -0,0 +1,271 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from source.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (100, 1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> "PipelineMetrics":
+    """Process-wide metrics registry, so providers and analyzers can record stages too."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = PipelineMetrics()
+        return _metrics
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs including +Inf."""
+        pairs, running = [], 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            running += count
+            pairs.append(("+Inf" if bound == float("inf") else f"{bound:g}", running))
+        return pairs
+
+
+class Stage:
+    """Handle yielded by PipelineMetrics.stage; set failed for errors returned as strings."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failed = False
+
+
+class PipelineRun:
+    """Measurements of one notification, written as one JSONL line when finished."""
+
+    def __init__(self, metrics: "PipelineMetrics", mode: str, provider: str):
+        self.metrics = metrics
+        self.mode = mode
+        self.provider = provider
+        self.outcome = "ok"
+        self.stages: Dict[str, float] = {}
+        self.errors: List[str] = []
+        self.sizes: Dict[str, int] = {}
+        self.usage: Dict[str, float] = {}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+
+    def finish(self) -> None:
+        self.metrics.finish_run(self, time.perf_counter() - self._start)
+
+
+class PipelineMetrics:
+    """Per-stage latency histograms, error counters and payload sizes of the notification pipeline.
+
+    Every finished run is appended to a JSONL file and the aggregate is
+    rewritten as a Prometheus text-format file (and optionally served over HTTP).
+    """
+
+    def __init__(
+        self,
+        jsonl_path: Optional[Path] = Path(Config.METRICS_JSONL_PATH),
+        prometheus_path: Optional[Path] = Path(Config.METRICS_PROMETHEUS_PATH)
+    ):
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.prometheus_path = Path(prometheus_path) if prometheus_path else None
+        self._stage_seconds: Dict[str, Histogram] = {}
+        self._stage_errors: Dict[str, int] = {}
+        self._sizes: Dict[str, Histogram] = {}
+        self._runs: Dict[Tuple[str, str], int] = {}
+        self._skips: Dict[str, int] = {}
+        self._run_seconds: Dict[str, Histogram] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._server = None
+
+    def start_run(self, mode: str, provider: str) -> PipelineRun:
+        """Begin a notification; stages recorded on this thread are attributed to it."""
+        run = PipelineRun(self, mode, provider)
+        self._local.run = run
+        return run
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage; exceptions and stage.failed count as errors."""
+        stage = Stage(name)
+        start = time.perf_counter()
+        try:
+            yield stage
+        except Exception:
+            stage.failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._stage_seconds.setdefault(name, Histogram(LATENCY_BUCKETS)).observe(elapsed)
+                if stage.failed:
+                    self._stage_errors[name] = self._stage_errors.get(name, 0) + 1
+            run = getattr(self._local, "run", None)
+            if run is not None:
+                run.stages[name] = round(run.stages.get(name, 0.0) + elapsed, 4)
+                if stage.failed:
+                    run.errors.append(name)
+
+    def observe(self, kind: str, value: int) -> None:
+        """Record a payload or prompt size."""
+        with self._lock:
+            self._sizes.setdefault(kind, Histogram(SIZE_BUCKETS)).observe(value)
+        run = getattr(self._local, "run", None)
+        if run is not None:
+            run.sizes[kind] = value
+
+    def record_skip(self, reason: str) -> None:
+        """Count a notification slot skipped without running the models."""
+        with self._lock:
+            self._skips[reason] = self._skips.get(reason, 0) + 1
+        self.write_prometheus()
+
+    def last_run(self) -> Optional[Dict]:
+        """JSONL entry of the last run finished on this thread."""
+        return getattr(self._local, "last_entry", None)
+
+    def finish_run(self, run: PipelineRun, latency: float) -> None:
+        if getattr(self._local, "run", None) is run:
+            self._local.run = None
+        entry = {
+            "timestamp": run.started_at,
+            "mode": run.mode,
+            "provider": run.provider,
+            "outcome": run.outcome,
+            "latency_s": round(latency, 3),
+            "stages": run.stages,
+            "errors": run.errors,
+            "sizes": run.sizes,
+            "prompt_tokens": run.usage.get("prompt_tokens", 0),
+            "output_tokens": run.usage.get("output_tokens", 0),
+            "tokens_per_sec": round(run.usage.get("tokens_per_sec", 0.0), 2),
+            "prefill_s": round(run.usage.get("prefill_s", 0.0), 3),
+            "cached_tokens": run.usage.get("cached_tokens", 0),
+        }
+        self._local.last_entry = entry
+        with self._lock:
+            self._runs[(run.mode, run.outcome)] = self._runs.get((run.mode, run.outcome), 0) + 1
+            self._run_seconds.setdefault(run.mode, Histogram(LATENCY_BUCKETS)).observe(latency)
+            if self.jsonl_path:
+                try:
+                    with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry) + "\n")
+                except IOError as e:
+                    logger.warning(f"Could not write pipeline metrics: {e}")
+        self.write_prometheus()
+
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in run.stages.items())
+        logger.info(
+            f"Pipeline ({run.mode}, {run.provider}, {run.outcome}): {latency:.2f}s [{stages}], "
+            f"{entry['output_tokens']} tokens at {entry['tokens_per_sec']} tok/s, "
+            f"{entry['cached_tokens']} of {entry['prompt_tokens']} prompt tokens cached"
+        )
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Call count, mean latency and error rate of every stage seen in this process."""
+        with self._lock:
+            return {
+                name: {
+                    "count": histogram.count,
+                    "mean_s": histogram.total / histogram.count,
+                    "error_rate": self._stage_errors.get(name, 0) / histogram.count,
+                }
+                for name, histogram in self._stage_seconds.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """Current metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def histogram(metric: str, help_text: str, label: str, series: Dict[str, Histogram]) -> None:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for key, hist in sorted(series.items()):
+                for le, count in hist.cumulative():
+                    lines.append(f'{metric}_bucket{{{label}="{key}",le="{le}"}} {count}')
+                lines.append(f'{metric}_sum{{{label}="{key}"}} {hist.total:g}')
+                lines.append(f'{metric}_count{{{label}="{key}"}} {hist.count}')
+
+        with self._lock:
+            histogram("motivation_stage_seconds", "Latency of notification pipeline stages.", "stage", self._stage_seconds)
+            lines.append("# HELP motivation_stage_errors_total Failed pipeline stages.")
+            lines.append("# TYPE motivation_stage_errors_total counter")
+            for name in sorted(self._stage_seconds):
+                lines.append(f'motivation_stage_errors_total{{stage="{name}"}} {self._stage_errors.get(name, 0)}')
+            histogram("motivation_payload_size", "Payload and prompt sizes (bytes or characters).", "kind", self._sizes)
+            histogram("motivation_notification_seconds", "End-to-end notification latency.", "mode", self._run_seconds)
+            lines.append("# HELP motivation_notifications_total Notifications by pipeline mode and outcome.")
+            lines.append("# TYPE motivation_notifications_total counter")
+            for (mode, outcome), count in sorted(self._runs.items()):
+                lines.append(f'motivation_notifications_total{{mode="{mode}",outcome="{outcome}"}} {count}')
+            lines.append("# HELP motivation_notifications_skipped_total Notification slots skipped before any model call.")
+            lines.append("# TYPE motivation_notifications_skipped_total counter")
+            for reason, count in sorted(self._skips.items()):
+                lines.append(f'motivation_notifications_skipped_total{{reason="{reason}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self) -> None:
+        """Atomically rewrite the text-format file (e.g. for node_exporter's textfile collector)."""
+        if not self.prometheus_path:
+            return
+        temp_path = self.prometheus_path.with_suffix(self.prometheus_path.suffix + ".tmp")
+        with self._write_lock:
+            try:
+                temp_path.write_text(self.render_prometheus(), encoding="utf-8")
+                os.replace(temp_path, self.prometheus_path)
+            except OSError as e:
+                logger.warning(f"Could not write Prometheus metrics: {e}")
+
+    def serve(self, port: int) -> None:
+        """Expose /metrics on localhost in a daemon thread (once per process)."""
+        if self._server is not None:
+            return
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        except OSError as e:
+            logger.warning(f"Could not serve metrics on port {port}: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
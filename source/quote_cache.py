@@ -0,0 +1,78 @@
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Tuple
+from source.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def digest(text: str) -> str:
+    """Stable short digest of a prompt component."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class QuoteCache:
+    """Memoizes generated quotes by context and screen digests, with TTL and LRU eviction.
+
+    Up to `candidates` different quotes are collected per key; once the key is
+    full a random one is returned, so repeated hits are not always identical.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = Config.QUOTE_CACHE_SIZE,
+        ttl_seconds: float = Config.QUOTE_CACHE_TTL_SECONDS,
+        candidates: int = Config.QUOTE_CACHE_CANDIDATES
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.candidates = max(1, candidates)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[List[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(context: str, screenshot_description: str) -> str:
+        return digest(f"{digest(context)}:{digest(screenshot_description)}")
+
+    def get_or_generate(
+        self,
+        context: str,
+        screenshot_description: str,
+        generate: Callable[[str, str], str]
+    ) -> str:
+        """Return a cached quote for these inputs or call generate and remember it."""
+        key = self.make_key(context, screenshot_description)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is not None and len(entry[0]) >= self.candidates:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return random.choice(entry[0])
+            self.misses += 1
+
+        quote = generate(context, screenshot_description)
+        if quote.startswith("Error"):
+            return quote
+
+        with self._lock:
+            quotes, stored_at = self._entries.get(key, ([], time.time()))
+            quotes.append(quote)
+            self._entries[key] = (quotes, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return quote
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,186 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+from source.config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens (works for Ukrainian and English)."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough model token count used for prompt budgeting."""
+    return len(text) // Config.CHARS_PER_TOKEN + 1
+
+
+def split_into_chunks(text: str, max_chars: int) -> List[str]:
+    """Split a note into paragraph-aligned chunks of at most max_chars."""
+    chunks = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def pack_context(parts: Iterable[Tuple[float, str]], token_budget: int) -> List[Tuple[float, str]]:
+    """Take (score, text) context parts in order until token_budget is spent."""
+    packed = []
+    used = 0
+    for score, part in parts:
+        cost = estimate_tokens(part)
+        if used + cost > token_budget:
+            if packed:
+                continue
+            # Always return something, even if the single best part is too long
+            part = part[:token_budget * Config.CHARS_PER_TOKEN]
+            cost = token_budget
+        packed.append((score, part))
+        used += cost
+        if used >= token_budget:
+            break
+    return packed
+
+
+class BM25Index:
+    """In-memory inverted index with BM25 ranking over note chunks."""
+
+    def __init__(self, k1: float = Config.BM25_K1, b: float = Config.BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.chunk_chars = Config.RETRIEVAL_CHUNK_CHARS
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._chunks: Dict[int, Tuple[str, str, str]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._note_chunks: Dict[str, List[int]] = {}
+        self._note_mtimes: Dict[str, int] = {}
+        self._total_length = 0
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def add_note(self, path: str, title: str, text: str, mtime: int = 0) -> None:
+        """Index (or re-index) a note under its vault-relative path."""
+        self.remove_note(path)
+        chunk_ids = []
+        for chunk in split_into_chunks(text, self.chunk_chars):
+            chunk_id = self._next_id
+            self._next_id += 1
+            terms = Counter(tokenize(f"{title}\n{chunk}"))
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[chunk_id] = tf
+            length = sum(terms.values())
+            self._chunks[chunk_id] = (path, title, chunk)
+            self._lengths[chunk_id] = length
+            self._total_length += length
+            chunk_ids.append(chunk_id)
+        self._note_chunks[path] = chunk_ids
+        self._note_mtimes[path] = mtime
+
+    def remove_note(self, path: str) -> None:
+        """Drop every chunk of a note from the index."""
+        chunk_ids = self._note_chunks.pop(path, None)
+        self._note_mtimes.pop(path, None)
+        if not chunk_ids:
+            return
+        for chunk_id in chunk_ids:
+            _, title, chunk = self._chunks.pop(chunk_id)
+            self._total_length -= self._lengths.pop(chunk_id)
+            for term in set(tokenize(f"{title}\n{chunk}")):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, top_k: int = 50) -> List[Tuple[int, float]]:
+        """Return (chunk_id, score) pairs of the best matching chunks."""
+        if not self._chunks:
+            return []
+        n_chunks = len(self._chunks)
+        avg_length = self._total_length / n_chunks or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
+
+    def build_context(
+        self,
+        query: str,
+        token_budget: int = Config.CONTEXT_TOKEN_BUDGET,
+        semantic_hits: Sequence[Tuple[str, int]] = ()
+    ) -> str:
+        """Assemble the most relevant chunks into a context that fits token_budget."""
+        return "\n".join(part for _, part in self.scored_context(query, token_budget, semantic_hits))
+
+    def scored_context(
+        self,
+        query: str,
+        token_budget: int = Config.CONTEXT_TOKEN_BUDGET,
+        semantic_hits: Sequence[Tuple[str, int]] = ()
+    ) -> List[Tuple[float, str]]:
+        """Render the best chunks with their scores until token_budget is spent.
+
+        semantic_hits are (path, chunk index) pairs from an embedding search,
+        best first; they are merged with the BM25 ranking by reciprocal rank.
+        """
+        ranked = self.search(query, top_k=len(self._chunks))
+        if semantic_hits:
+            ranked = self._fuse([chunk_id for chunk_id, _ in ranked], self._chunk_ids(semantic_hits))
+        if not ranked:
+            # Nothing matched the screen: fall back to the most recently edited notes
+            recent = sorted(self._note_mtimes, key=self._note_mtimes.get, reverse=True)
+            ranked = [(chunk_id, 0.0) for path in recent for chunk_id in self._note_chunks[path]]
+        return pack_context(((score, self._format(chunk_id)) for chunk_id, score in ranked), token_budget)
+
+    def _chunk_ids(self, hits: Sequence[Tuple[str, int]]) -> List[int]:
+        """Map (path, chunk index) pairs to chunk ids, skipping notes indexed differently."""
+        chunk_ids = []
+        for path, index in hits:
+            note_chunks = self._note_chunks.get(path, [])
+            if index < len(note_chunks):
+                chunk_ids.append(note_chunks[index])
+        return chunk_ids
+
+    @staticmethod
+    def _fuse(*rankings: List[int]) -> List[Tuple[int, float]]:
+        """Reciprocal rank fusion of several best-first rankings."""
+        scores: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, chunk_id in enumerate(ranking):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (Config.RRF_K + rank + 1)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def _format(self, chunk_id: int) -> str:
+        """Render a chunk in the snapshot format."""
+        _, title, chunk = self._chunks[chunk_id]
+        return f"Назва файлу: {title}\nТекст файлу: <<{chunk}>>\n"
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple
+from source.config import Config
+import logging
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(image: "Image.Image", hash_size: int = 8) -> int:
+    """Compute a 64-bit difference hash of an image from a tiny grayscale thumbnail."""
+    from PIL import Image
+
+    # Box-reduce first so hashing a 4K frame stays in the sub-millisecond range
+    factor = max(1, min(image.size) // (hash_size * 8))
+    thumbnail = image.reduce(factor) if factor > 1 else image
+    thumbnail = thumbnail.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(thumbnail.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+class ScreenCache:
+    """Bounded LRU cache of screenshot descriptions keyed by perceptual hash, with TTL."""
+
+    def __init__(
+        self,
+        path: Optional[Path] = Path(Config.SCREEN_CACHE_PATH),
+        max_entries: int = Config.SCREEN_CACHE_SIZE,
+        ttl_seconds: float = Config.SCREEN_CACHE_TTL_SECONDS,
+        threshold: int = Config.SCREEN_HASH_THRESHOLD
+    ):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def lookup(self, screen_hash: int) -> Optional[str]:
+        """Return the description of the closest recent screen within the threshold."""
+        with self._lock:
+            self._evict_expired()
+            best_hash = None
+            best_distance = self.threshold + 1
+            for cached_hash in self._entries:
+                distance = hamming_distance(screen_hash, cached_hash)
+                if distance < best_distance:
+                    best_hash, best_distance = cached_hash, distance
+
+            if best_hash is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_hash)
+            return self._entries[best_hash][0]
+
+    def store(self, screen_hash: int, description: str) -> None:
+        """Remember a description for a screen and persist the cache."""
+        with self._lock:
+            self._entries[screen_hash] = (description, time.time())
+            self._entries.move_to_end(screen_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for cached_hash in [h for h, (_, stored_at) in self._entries.items() if stored_at < cutoff]:
+            del self._entries[cached_hash]
+
+    def _load(self) -> None:
+        """Restore unexpired entries saved by a previous run."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for entry in data:
+                self._entries[int(entry["hash"], 16)] = (entry["description"], entry["stored_at"])
+            self._evict_expired()
+        except (json.JSONDecodeError, IOError, KeyError, ValueError) as e:
+            logger.warning(f"Could not load screen cache: {e}")
+            self._entries.clear()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        data = [
+            {"hash": f"{screen_hash:016x}", "description": description, "stored_at": stored_at}
+            for screen_hash, (description, stored_at) in self._entries.items()
+        ]
+        try:
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            logger.warning(f"Could not save screen cache: {e}")
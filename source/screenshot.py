@@ -1,60 +1,181 @@
-
 from source.ai_providers import AIProvider
 from source.config import Config
-import pyautogui
-import time
-import os
+from source.metrics import get_metrics
+from source.screen_cache import ScreenCache, dhash
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
+import ctypes
+import sys
 import logging
 
+if TYPE_CHECKING:
+    from PIL import Image
+
 logger = logging.getLogger(__name__)
 
+# (left, top, right, bottom) in virtual desktop coordinates; negative left of or above the primary monitor
+Box = Tuple[int, int, int, int]
+
+
+def grab_screen() -> "Image.Image":
+    """Capture the whole screen with pyautogui (imported here; it needs a display)."""
+    import pyautogui
+    return pyautogui.screenshot()
+
+
+def grab_region(box: Box) -> "Image.Image":
+    """Capture one box of the virtual desktop, on whichever monitor it is."""
+    from PIL import ImageGrab
+    return ImageGrab.grab(bbox=box, all_screens=True)
+
+
+def active_window_box() -> Optional[Box]:
+    """Bounds of the foreground window, clipped to its monitor; None if there is none."""
+    import pygetwindow
+    window = pygetwindow.getActiveWindow()
+    if window is None or window.isMinimized:
+        return None
+    box = (window.left, window.top, window.right, window.bottom)
+    # Maximized windows overhang their monitor by the invisible resize border
+    monitor = active_monitor_box()
+    if monitor is not None:
+        box = (max(box[0], monitor[0]), max(box[1], monitor[1]), min(box[2], monitor[2]), min(box[3], monitor[3]))
+    return box
+
+
+def active_monitor_box() -> Optional[Box]:
+    """Bounds of the monitor holding the foreground window; None if unknown."""
+    if sys.platform != "win32":
+        return None
+    from ctypes import wintypes
+
+    class MONITORINFO(ctypes.Structure):
+        _fields_ = [
+            ("cbSize", wintypes.DWORD),
+            ("rcMonitor", wintypes.RECT),
+            ("rcWork", wintypes.RECT),
+            ("dwFlags", wintypes.DWORD),
+        ]
+
+    user32 = ctypes.windll.user32
+    user32.GetForegroundWindow.restype = wintypes.HWND
+    user32.MonitorFromWindow.restype = wintypes.HMONITOR
+    user32.MonitorFromWindow.argtypes = [wintypes.HWND, wintypes.DWORD]
+    window = user32.GetForegroundWindow()
+    if not window:
+        return None
+    monitor = user32.MonitorFromWindow(window, 2)  # MONITOR_DEFAULTTONEAREST
+    info = MONITORINFO()
+    info.cbSize = ctypes.sizeof(info)
+    if not user32.GetMonitorInfoW(monitor, ctypes.byref(info)):
+        return None
+    rect = info.rcMonitor
+    return rect.left, rect.top, rect.right, rect.bottom
+
+
+class RegionCapture:
+    """Capture source that crops to a box around the user's focus, e.g. the foreground window.
+
+    Falls back to the whole screen when the box is unknown (no foreground
+    window, an unsupported platform) or smaller than CAPTURE_MIN_SIDE.
+    """
+
+    def __init__(
+        self,
+        locate: Callable[[], Optional[Box]],
+        grab: Callable[[Box], "Image.Image"] = grab_region,
+        fallback: Callable[[], "Image.Image"] = grab_screen
+    ):
+        """
+        :param locate: Returns the box to capture, or None.
+        :param grab: Captures a box.
+        :param fallback: Captures the whole screen.
+        """
+        self.locate = locate
+        self.grab = grab
+        self.fallback = fallback
+
+    def __call__(self) -> "Image.Image":
+        try:
+            box = self.locate()
+        except Exception as e:
+            logger.debug(f"Could not locate the capture region: {e}")
+            box = None
+        if box is None or min(box[2] - box[0], box[3] - box[1]) < Config.CAPTURE_MIN_SIDE:
+            return self.fallback()
+        return self.grab(box)
+
+
+def make_capture_source(mode: Optional[str] = None) -> Callable[[], "Image.Image"]:
+    """Capture backend for mode (default Config.CAPTURE_MODE): "screen", "window" or "monitor"."""
+    mode = mode or Config.CAPTURE_MODE
+    if mode == "window":
+        return RegionCapture(active_window_box)
+    if mode == "monitor":
+        return RegionCapture(active_monitor_box)
+    if mode != "screen":
+        logger.warning(f"Unknown capture mode {mode!r}, capturing the whole screen")
+    return grab_screen
+
 
 class ScreenshotAnalyzer:
     """Handles screenshot capture and analysis."""
-    
-    def __init__(self, ai_provider: AIProvider):
+
+    def __init__(
+        self,
+        ai_provider: AIProvider,
+        capture_source: Optional[Callable[[], "Image.Image"]] = None
+    ):
         self.ai_provider = ai_provider
-        self.screenshot_path = Config.TEMP_SCREENSHOT_PATH
-    
+        self.capture_source = capture_source or make_capture_source()
+        self.screen_cache = ScreenCache() if Config.SCREEN_CACHE_ENABLED else None
+
+    def capture(self) -> "Image.Image":
+        """Capture the screen into memory."""
+        with get_metrics().stage("capture"):
+            image = self.capture_source()
+        get_metrics().observe("capture_pixels", image.width * image.height)
+        return image
+
+    @staticmethod
+    def fingerprint(image: "Image.Image") -> str:
+        """Perceptual fingerprint of a screen, stable across small changes."""
+        return f"screen:{dhash(image):016x}"
+
     def capture_and_analyze(self) -> str:
         """Capture screenshot and return AI analysis."""
-        start_time = time.time()
-        
         try:
-            # Capture screenshot
-            capture_start = time.time()
-            screenshot = pyautogui.screenshot()
-            screenshot.save(self.screenshot_path)
-            capture_time = time.time() - capture_start
-            
-            logger.info(f"Screenshot captured in {capture_time:.2f} seconds")
-            
+            # Capture screenshot; it stays in memory and is encoded by the provider
+            screenshot = self.capture()
+        except Exception as e:
+            logger.error(f"Screenshot capture failed: {e}")
+            return f"Error: {str(e)}"
+        return self.analyze(screenshot)
+
+    def analyze(self, screenshot: "Image.Image") -> str:
+        """Return the AI description of an already captured screenshot."""
+        try:
+            # Reuse the description of a near-identical recent screen
+            screen_hash = None
+            if self.screen_cache is not None:
+                screen_hash = dhash(screenshot)
+                cached = self.screen_cache.lookup(screen_hash)
+                if cached is not None:
+                    logger.info(
+                        f"Screen unchanged, reusing cached description "
+                        f"(hit rate {self.screen_cache.hit_rate:.0%})"
+                    )
+                    return cached
+
             # Analyze with AI
-            analysis_start = time.time()
-            description = self.ai_provider.analyze_screenshot(self.screenshot_path)
-            analysis_time = time.time() - analysis_start
-            
-            total_time = time.time() - start_time
-            logger.info(
-                f"Screenshot analysis completed:\n"
-                f"- Capture: {capture_time:.2f}s\n"
-                f"- Analysis: {analysis_time:.2f}s\n"
-                f"- Total: {total_time:.2f}s"
-            )
-            
+            with get_metrics().stage("vision") as stage:
+                description = self.ai_provider.analyze_screenshot(screenshot)
+                stage.failed = description.startswith("Error")
+
+            if screen_hash is not None and not stage.failed:
+                self.screen_cache.store(screen_hash, description)
+
             return description
-            
+
         except Exception as e:
             logger.error(f"Screenshot analysis failed: {e}")
             return f"Error: {str(e)}"
-        finally:
-            # Clean up temporary file
-            self._cleanup_screenshot()
-    
-    def _cleanup_screenshot(self) -> None:
-        """Remove temporary screenshot file."""
-        try:
-            if os.path.exists(self.screenshot_path):
-                os.remove(self.screenshot_path)
-        except OSError as e:
-            logger.warning(f"Could not remove temporary screenshot: {e}")
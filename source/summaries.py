@@ -0,0 +1,185 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from pathlib import PurePosixPath
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from source.config import Config
+from source.context_store import ContextStore
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class VaultSummarizer:
+    """Builds a note -> folder -> vault hierarchy of model summaries, cached by content hash.
+
+    Every summary is stored under a key derived from what it summarizes (the
+    note's content hash, or the child summaries of a folder), so a refresh
+    only calls the model for notes that changed and for the folders above them.
+    """
+
+    # Bump when the summary prompt changes so stored summaries are rebuilt
+    PROMPT_VERSION = "1"
+
+    def __init__(
+        self,
+        store: ContextStore,
+        summarize: Callable[[str, str], str],
+        workers: int = Config.SUMMARY_WORKERS,
+        fan_in: int = Config.SUMMARY_FAN_IN
+    ):
+        """
+        :param store: Context store holding the notes and the cached summaries.
+        :param summarize: Called as summarize(text, kind) with kind "note", "folder" or "vault".
+        :param workers: Maximum concurrent summarize calls.
+        :param fan_in: Maximum summaries merged by one call.
+        """
+        self.store = store
+        self.summarize = summarize
+        self.workers = max(1, workers)
+        self.fan_in = max(2, fan_in)
+        self.generated = 0
+        self.reused = 0
+        self._digest = ""
+        self._digest_version = -1
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def make_key(cls, kind: str, content: str) -> str:
+        return hashlib.sha256(f"{kind}:{cls.PROMPT_VERSION}:{content}".encode("utf-8")).hexdigest()
+
+    def is_stale(self) -> bool:
+        """Check whether the notes changed since the digest was built."""
+        return self._digest_version != self.store.version
+
+    def digest(self, token_budget: int = Config.SUMMARY_DIGEST_TOKENS) -> str:
+        """Return the last built digest without waiting for a refresh."""
+        return self._digest[:token_budget * Config.CHARS_PER_TOKEN]
+
+    def refresh_async(self) -> None:
+        """Rebuild the digest on a background thread, unless a rebuild is already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.refresh, name="vault-summaries", daemon=True)
+            self._thread.start()
+
+    def refresh(self) -> str:
+        """Summarize changed notes, roll them up and rebuild the digest."""
+        start_time = time.perf_counter()
+        generated, reused = self.generated, self.reused
+        version = self.store.version
+        used_keys: Set[str] = set()
+
+        try:
+            notes = list(self.store.iter_note_hashes())
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="summary") as pool:
+                note_summaries = self._summarize_notes(pool, notes, used_keys)
+                folders = [
+                    (folder, [note_summaries[path] for path, _, _ in group if path in note_summaries])
+                    for folder, group in groupby(notes, key=lambda note: note[1])
+                ]
+                folders = [(folder, summaries) for folder, summaries in folders if summaries]
+                folder_summaries = list(pool.map(
+                    lambda item: self._reduce("folder", item[1], used_keys), folders
+                ))
+            named = [
+                (self._folder_name(folder), summary)
+                for (folder, _), summary in zip(folders, folder_summaries) if summary
+            ]
+            vault_summary = self._reduce("vault", [f"{name}: {summary}" for name, summary in named], used_keys)
+        except Exception as e:
+            logger.error(f"Error building vault summaries: {e}")
+            return self._digest
+
+        self._digest = self._render(vault_summary, named)
+        self._digest_version = version
+        removed = self.store.prune_summaries(used_keys)
+        logger.info(
+            f"Vault summaries refreshed in {time.perf_counter() - start_time:.1f}s: "
+            f"{self.generated - generated} generated, {self.reused - reused} reused, {removed} pruned"
+        )
+        return self._digest
+
+    def _summarize_notes(
+        self,
+        pool: ThreadPoolExecutor,
+        notes: List[Tuple[str, str, str]],
+        used_keys: Set[str]
+    ) -> Dict[str, str]:
+        """Return path -> summary, calling the model only for notes without a cached one."""
+        keys = {path: self.make_key("note", content_hash) for path, _, content_hash in notes}
+        used_keys.update(keys.values())
+        cached = self.store.get_summaries(set(keys.values()))
+        self.reused += sum(1 for key in keys.values() if key in cached)
+
+        missing = {}
+        for path, key in keys.items():
+            if key not in cached:
+                missing.setdefault(key, path)
+        if missing:
+            logger.info(f"Summarizing {len(missing)} new or edited notes")
+
+        def summarize_note(item: Tuple[str, str]) -> Tuple[str, Optional[str]]:
+            key, path = item
+            text = self.store.read_note(path, Config.SUMMARY_NOTE_MAX_CHARS)
+            if not text or not text.strip():
+                return key, None
+            return key, self._call(key, f"{PurePosixPath(path).stem}\n\n{text}", "note")
+
+        for key, summary in pool.map(summarize_note, missing.items()):
+            if summary:
+                cached[key] = summary
+        return {path: cached[key] for path, key in keys.items() if key in cached}
+
+    def _reduce(self, kind: str, summaries: List[str], used_keys: Set[str]) -> Optional[str]:
+        """Merge summaries into one, in groups of fan_in so large folders fit a prompt."""
+        if not summaries:
+            return None
+        if kind == "folder" and len(summaries) == 1:
+            # A single note already is the folder summary
+            return summaries[0]
+        while True:
+            groups = [summaries[i:i + self.fan_in] for i in range(0, len(summaries), self.fan_in)]
+            merged = []
+            for group in groups:
+                text = "\n".join(f"- {summary}" for summary in group)
+                key = self.make_key(kind, text)
+                used_keys.add(key)
+                summary = self.store.get_summaries([key]).get(key)
+                if summary is not None:
+                    self.reused += 1
+                else:
+                    summary = self._call(key, text, kind)
+                if summary:
+                    merged.append(summary)
+            if len(merged) <= 1:
+                return merged[0] if merged else None
+            summaries = merged
+
+    def _call(self, key: str, text: str, kind: str) -> Optional[str]:
+        """Summarize once and store the result; failures are not cached so they are retried."""
+        try:
+            summary = self.summarize(text, kind).strip()
+        except Exception as e:
+            logger.warning(f"Could not summarize {kind}: {e}")
+            return None
+        if not summary or summary.startswith("Error"):
+            return None
+        self.store.put_summary(key, summary)
+        self.generated += 1
+        return summary
+
+    def _folder_name(self, folder: str) -> str:
+        return PurePosixPath(self.store.vault if folder == "." else folder).name
+
+    def _render(self, vault_summary: Optional[str], folders: List[Tuple[str, str]]) -> str:
+        """Render the vault summary first, then per-folder summaries."""
+        parts = []
+        if vault_summary:
+            parts.append(f"Загальний підсумок нотаток: {vault_summary}\n")
+        parts.extend(f"Папка {name}: {summary}\n" for name, summary in folders)
+        return "\n".join(parts)
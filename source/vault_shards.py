@@ -0,0 +1,221 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from source.config import Config
+from source.context_manager import ObsidianContextManager
+from source.retrieval import BM25Index, estimate_tokens, pack_context
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Set in worker processes by _init_worker
+_progress_queue = None
+
+
+def shard_store_path(vault_path: Path, store_path: Path) -> Path:
+    """Store file of one vault: the store name plus the vault name and a digest of its path."""
+    tag = hashlib.sha256(str(vault_path).encode("utf-8")).hexdigest()[:8]
+    name = re.sub(r"[^\w-]+", "_", vault_path.name) or "vault"
+    return store_path.with_name(f"{store_path.stem}.{name}-{tag}{store_path.suffix}")
+
+
+def read_vault_paths(config_path: Path, selected: Optional[Sequence[str]] = None) -> List[Path]:
+    """Vault folders listed in obsidian.json, optionally only those named (or located) in selected."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        vaults = [Path(vault["path"]) for vault in json.load(f)["vaults"].values()]
+    if selected:
+        wanted = set(selected)
+        vaults = [vault for vault in vaults if vault.name in wanted or str(vault) in wanted]
+    return vaults
+
+
+def _init_worker(progress_queue, log_level: int) -> None:
+    global _progress_queue
+    _progress_queue = progress_queue
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def _index_shard(vault_path: str, store_path: str) -> Tuple[bool, float]:
+    """Index one vault into its store; runs in a worker process and reports progress to the parent."""
+    start_time = time.perf_counter()
+    manager = ObsidianContextManager(vault_path=Path(vault_path), store_path=Path(store_path))
+    done = threading.Event()
+
+    def report():
+        while not done.wait(0.5):
+            _progress_queue.put((vault_path, manager.progress))
+
+    threading.Thread(target=report, name="shard-progress", daemon=True).start()
+    try:
+        ok = manager.generate_context_snapshot()
+    finally:
+        done.set()
+    return ok, time.perf_counter() - start_time
+
+
+class ShardedContextManager:
+    """Context from every configured Obsidian vault, with one store (shard) per vault.
+
+    Vaults are indexed in parallel worker processes, so indexing time follows
+    the largest vault and the core count rather than the total size. Queries
+    fan out to all shards and the best-scoring chunks are merged.
+    """
+
+    def __init__(self, vault_paths: Optional[Sequence[Path]] = None, store_path: Optional[Path] = None):
+        """
+        :param vault_paths: Vaults to index instead of those from the Obsidian config.
+        :param store_path: Base name of the shard stores instead of Config.CONTEXT_STORE_FILENAME.
+        """
+        self.config_path = Path(Config.OBSIDIAN_CONFIG_PATH)
+        self.store_path = Path(store_path or Config.CONTEXT_STORE_FILENAME)
+        if vault_paths is None:
+            vault_paths = self._read_config()
+        self._shards: Dict[str, ObsidianContextManager] = {}
+        for vault_path in vault_paths:
+            vault_path = Path(vault_path)
+            self._shards[str(vault_path)] = ObsidianContextManager(
+                vault_path=vault_path, store_path=shard_store_path(vault_path, self.store_path)
+            )
+        # vault -> (notes read, notes to read) reported by indexing processes
+        self._progress: Dict[str, Tuple[int, int]] = {}
+        self._query_pool = ThreadPoolExecutor(max_workers=max(1, len(self._shards)), thread_name_prefix="shard-query")
+
+    def _read_config(self) -> List[Path]:
+        if not self.config_path.exists():
+            logger.error(f"Obsidian config not found at {self.config_path}")
+            return []
+        try:
+            vaults = read_vault_paths(self.config_path, Config.VAULTS)
+        except Exception as e:
+            logger.error(f"Error reading Obsidian config: {e}")
+            return []
+        if not vaults:
+            logger.error("No vaults found in Obsidian config")
+        return vaults
+
+    @property
+    def shards(self) -> List[ObsidianContextManager]:
+        return list(self._shards.values())
+
+    @property
+    def progress(self) -> Tuple[int, int]:
+        """(notes read, notes to read) over all shards."""
+        per_shard = [self._progress.get(vault, shard.progress) for vault, shard in self._shards.items()]
+        return sum(done for done, _ in per_shard), sum(total for _, total in per_shard)
+
+    def has_context(self) -> bool:
+        return bool(self._shards) and all(shard.has_context() for shard in self.shards)
+
+    def note_count(self) -> int:
+        return sum(shard.note_count() for shard in self.shards)
+
+    def generate_context_snapshot(self) -> bool:
+        """Index every vault, in parallel processes when there is more than one."""
+        if not self._shards:
+            return False
+        workers = min(len(self._shards), Config.VAULT_INDEX_PROCESSES or os.cpu_count() or 1)
+        if workers <= 1:
+            return all([shard.generate_context_snapshot() for shard in self.shards])
+        return self._index_in_processes(workers)
+
+    def _index_in_processes(self, workers: int) -> bool:
+        # Spawn, not fork: the parent runs watcher, HTTP and Qt threads
+        context = multiprocessing.get_context("spawn")
+        progress_queue = context.Queue()
+
+        def drain():
+            for vault, progress in iter(progress_queue.get, None):
+                self._progress[vault] = progress
+
+        drainer = threading.Thread(target=drain, name="shard-progress", daemon=True)
+        drainer.start()
+        start_time = time.perf_counter()
+        results = []
+        # Keep the in-process watchers from writing a store while its worker rebuilds it
+        with ExitStack() as locks:
+            for shard in self.shards:
+                locks.enter_context(shard._update_lock)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(progress_queue, logging.getLogger().getEffectiveLevel())
+            ) as pool:
+                futures = {
+                    vault: pool.submit(_index_shard, vault, str(shard.store.db_path))
+                    for vault, shard in self._shards.items()
+                }
+                for vault, future in futures.items():
+                    try:
+                        ok, seconds = future.result()
+                        logger.info(f"Indexed vault {vault} in {seconds:.1f}s")
+                    except Exception as e:
+                        logger.error(f"Indexing vault {vault} failed: {e}")
+                        ok = False
+                    results.append(ok)
+        progress_queue.put(None)
+        drainer.join()
+        self._progress.clear()
+        logger.info(
+            f"Indexed {len(futures)} vaults with {workers} processes in {time.perf_counter() - start_time:.1f}s"
+        )
+        return all(results)
+
+    def refresh_context(self, full: bool = False) -> bool:
+        """Refresh every shard, re-reading only changed notes unless full."""
+        if full:
+            for shard in self.shards:
+                shard.reset_store()
+        return self.generate_context_snapshot()
+
+    def get_current_context(self) -> str:
+        return "\n".join(shard.get_current_context() for shard in self.shards)
+
+    def get_relevant_context(self, query: str, token_budget: int = Config.CONTEXT_TOKEN_BUDGET) -> str:
+        """Get the notes most relevant to query from all vaults, trimmed to token_budget."""
+        if not self._shards:
+            return ""
+        if not self.has_context():
+            logger.info("Context store is empty, generating new context...")
+            self.generate_context_snapshot()
+
+        digest_budget = min(Config.SUMMARY_DIGEST_TOKENS, token_budget // 2) // len(self._shards)
+        digest = "\n".join(filter(None, (shard.get_digest(digest_budget) for shard in self.shards)))
+        budget = token_budget - estimate_tokens(digest)
+        futures = [self._query_pool.submit(shard.get_scored_context, query, budget) for shard in self.shards]
+        matched, fallbacks, texts = [], [], {}
+        for shard_index, future in enumerate(futures):
+            try:
+                ranked = future.result()
+            except Exception as e:
+                logger.error(f"Error retrieving context from a vault: {e}")
+                continue
+            keys = [(shard_index, rank) for rank in range(len(ranked))]
+            texts.update(zip(keys, (text for _, text in ranked)))
+            # A vault without a match returns its recent notes, scored 0
+            (matched if any(score > 0 for score, _ in ranked) else fallbacks).append(keys)
+        # BM25 scores depend on each vault's own statistics, so merge the vaults by rank;
+        # recent notes only stand in when no vault matched at all
+        fused = BM25Index._fuse(*(matched or fallbacks))
+        notes = "\n".join(part for _, part in pack_context(((score, texts[key]) for key, score in fused), budget))
+        return f"{digest}\n{notes}" if digest else notes
+
+    def enable_embeddings(self, embedder=None) -> None:
+        for shard in self.shards:
+            shard.enable_embeddings(embedder)
+
+    def enable_summaries(self, summarize: Callable[[str, str], str]) -> None:
+        for shard in self.shards:
+            shard.enable_summaries(summarize)
+
+    def refresh_background(self) -> None:
+        for shard in self.shards:
+            shard.refresh_background()
@@ -0,0 +1,173 @@
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+from source.config import Config
+from source.context_manager import ObsidianContextManager
+import logging
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional dependency, fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+
+class _VaultEventHandler(FileSystemEventHandler):
+    """Forwards watchdog events to the watcher."""
+
+    def __init__(self, watcher: "VaultWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event) -> None:
+        if event.is_directory:
+            # Folder moves and deletions touch many notes at once
+            if event.event_type in ("moved", "deleted"):
+                self.watcher.request_rescan()
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if path and str(path).endswith(".md"):
+                self.watcher.notify_change(Path(path))
+
+
+class VaultWatcher:
+    """Keeps the Obsidian context store live by applying debounced vault changes."""
+
+    def __init__(self, context_manager: ObsidianContextManager):
+        self.context_manager = context_manager
+        self.debounce = Config.WATCH_DEBOUNCE_SECONDS
+        self.max_delay = Config.WATCH_MAX_DELAY_SECONDS
+        self.poll_interval = Config.WATCH_POLL_INTERVAL_SECONDS
+        self.vault_path: Optional[Path] = None
+
+        self._dirty: Set[Path] = set()
+        self._rescan = False
+        self._first_event = 0.0
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads) and not self._stop.is_set()
+
+    def start(self) -> bool:
+        """Start watching the vault from obsidian.json in the background."""
+        if self.running:
+            return True
+        self.vault_path = self.context_manager.resolve_vault_path()
+        if self.vault_path is None or not self.vault_path.is_dir():
+            logger.warning("Vault watcher not started: vault path unavailable")
+            return False
+
+        self._stop.clear()
+        self._start_thread(self._apply_loop, "vault-watcher-apply")
+
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_VaultEventHandler(self), str(self.vault_path), recursive=True)
+                self._observer.daemon = True
+                self._observer.start()
+                logger.info(f"Watching vault {self.vault_path} with native notifications")
+                return True
+            except Exception as e:
+                logger.warning(f"Native file watching unavailable, polling instead: {e}")
+                self._observer = None
+
+        self._start_thread(self._poll_loop, "vault-watcher-poll")
+        logger.info(f"Watching vault {self.vault_path} by polling every {self.poll_interval}s")
+        return True
+
+    def stop(self) -> None:
+        """Stop watching and wait for background threads to exit."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def notify_change(self, path: Path) -> None:
+        """Record a changed note; applied once edits settle."""
+        with self._cond:
+            self._mark_dirty()
+            self._dirty.add(path)
+            self._cond.notify_all()
+
+    def request_rescan(self) -> None:
+        """Schedule a full incremental rescan of the vault."""
+        with self._cond:
+            self._mark_dirty()
+            self._rescan = True
+            self._cond.notify_all()
+
+    def _mark_dirty(self) -> None:
+        """Track the burst window; caller holds _cond."""
+        now = time.monotonic()
+        if not self._dirty and not self._rescan:
+            self._first_event = now
+        self._last_event = now
+
+    def _start_thread(self, target, name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _apply_loop(self) -> None:
+        """Coalesce bursts of events and apply them once the vault is quiet."""
+        while not self._stop.is_set():
+            with self._cond:
+                while not (self._dirty or self._rescan) and not self._stop.is_set():
+                    self._cond.wait()
+                if self._stop.is_set():
+                    return
+
+                # Obsidian autosaves every few seconds while typing: wait for a pause,
+                # but never hold changes back longer than max_delay
+                now = time.monotonic()
+                ready_at = min(self._last_event + self.debounce, self._first_event + self.max_delay)
+                if now < ready_at:
+                    self._cond.wait(ready_at - now)
+                    continue
+
+                paths, self._dirty = self._dirty, set()
+                rescan, self._rescan = self._rescan, False
+
+            try:
+                if rescan:
+                    self.context_manager.generate_context_snapshot()
+                else:
+                    logger.info(f"Applying {len(paths)} changed notes from vault watcher")
+                    self.context_manager.update_notes(paths)
+            except Exception as e:
+                logger.error(f"Vault watcher failed to apply changes: {e}")
+
+    def _poll_loop(self) -> None:
+        """Portable fallback: diff note metadata every poll_interval seconds."""
+        previous = self._stat_vault()
+        while not self._stop.wait(self.poll_interval):
+            current = self._stat_vault()
+            for path in current.keys() ^ previous.keys():
+                self.notify_change(path)
+            for path, stat in current.items():
+                if path in previous and previous[path] != stat:
+                    self.notify_change(path)
+            previous = current
+
+    def _stat_vault(self) -> Dict[Path, Tuple[int, int]]:
+        """Collect (mtime, size) for every note of the watched vault."""
+        return {
+            file_path: (stat.st_mtime_ns, stat.st_size)
+            for _, file_path, stat in self.context_manager.iter_vault_notes(self.vault_path)
+        }